@@ -0,0 +1,197 @@
+# pyClicker IDLE game - achievements
+# Every achievement is a threshold on a metric: total rate, lifetime widgets,
+# or how many of one generator are owned (generator 0 being clicks). The
+# thresholds for each metric are kept sorted with a position marking how far
+# the metric has got, so an update is one comparison against the next
+# threshold when nothing was reached, and a bisect over just the ones passed
+# when something was. Sets ("own 20 of each of these") are looked at only when
+# one of their parts is reached. Per-generator counts are only made for the
+# generators that get somewhere, so a long catalog costs nothing up front.
+#
+# Unlocked achievements are kept in the save (the 'ACHV' section, see saves.py)
+# and survive prestige.
+import time
+from bisect import bisect_right
+
+import numpy as np
+
+# metrics
+RATE = 'rate'
+LTWIDGETS = 'ltwidgets'
+
+def owned(index):
+    """ The metric for how many of generator index are owned (0 is clicks). """
+    return ('owned', index)
+
+# (threshold, title) for the metrics every game has
+rate_thresholds = ((1.0E+3, 'Cottage industry'), (1.0E+6, 'A million a second'),
+                   (1.0E+9, 'Billionaire rate'), (1.0E+12, 'Trillionaire rate'))
+lifetime_thresholds = ((1.0E+6, 'Widget millionaire'), (1.0E+9, 'Widget billionaire'),
+                       (1.0E+12, 'Widget trillionaire'), (1.0E+15, 'Widget quadrillionaire'))
+click_thresholds = (100, 250, 500, 1000)
+# every generator but the Click gets these
+owned_thresholds = (100, 250, 500)
+
+# sets: title, then the generators (by name) and how many of each must be owned at once
+default_sets = (('Basics', ('Pencil', 'Tape', 'Square'), 20),
+                ('Well equipped', ('Hammer', 'Screwdriver', 'Drill'), 50),
+                )
+
+
+class Achievement():
+    """ One achievement: reached when every (metric, threshold) in parts is.
+
+        >>> Achievement('clicks 100', '100 clicks', [(owned(0), 100)])
+    """
+
+    __slots__ = ('key', 'title', 'parts')
+
+    def __init__(self, key, title, parts):
+        self.key = key
+        self.title = title
+        self.parts = tuple(parts)
+        return None
+
+    def __repr__(self):
+        return f'Achievement({self.key!r}, {self.title!r}, {list(self.parts)!r})'
+
+
+def default_rules(names):
+    """ The stock achievements for a game whose generators are called names. Per-generator
+    counts aren't listed here; Achievements makes them as each generator is first bought. """
+    rules = [Achievement(f'rate {t:g}', title, [(RATE, t)]) for t, title in rate_thresholds]
+    rules += [Achievement(f'lifetime {t:g}', title, [(LTWIDGETS, t)]) for t, title in lifetime_thresholds]
+    rules += [Achievement(f'clicks {n}', f'{n} clicks', [(owned(0), n)]) for n in click_thresholds]
+    index = {name: i for i, name in enumerate(names)}
+    for title, members, n in default_sets:
+        if all(m in index for m in members):
+            rules.append(Achievement(f'set {title}', f'{title}: {n} each of {", ".join(members)}',
+                                     [(owned(index[m]), n) for m in members]))
+    return rules
+
+
+class Achievements():
+    """ Tracks metrics against the rules and records what's been unlocked.
+        Call update(metric, value) whenever a metric changes; it returns the
+        achievements that just unlocked.
+
+        >>> cheevos = Achievements(default_rules(engine.items), engine.items)
+
+        >>> cheevos.update(owned(0), 100)       # [Achievement('clicks 100', ...)]
+
+        >>> cheevos.unlocked                    # {'clicks 100': unlock time, ...}
+    """
+
+    def __init__(self, rules, names = (), unlocked = None, clock = time.time):
+        self.rules = {r.key: r for r in rules}
+        self.names = list(names)
+        self.unlocked = dict(unlocked or {})    # key -> time it was unlocked
+        self.recent = []                        # unlocked since the last drain()
+        self.clock = clock
+        self._rules_by_metric = {}
+        for r in rules:
+            for metric, threshold in r.parts:
+                self._rules_by_metric.setdefault(metric, []).append((threshold, r))
+        self._index = {}        # metric -> (sorted thresholds, their rules)
+        self._pos = {}          # metric -> how many of its thresholds the current value has passed
+        self._value = {}        # metric -> last value seen
+        return None
+
+    def __len__(self):
+        return len(self.rules)
+
+    def _build(self, metric):
+        entries = list(self._rules_by_metric.get(metric, ()))
+        if isinstance(metric, tuple) and metric[1] > 0:
+            # the per-generator counts, made the first time the generator is seen
+            i = metric[1]
+            name = self.names[i] if i < len(self.names) else f'generator {i}'
+            for n in owned_thresholds:
+                key = f'owned {i} {n}'
+                if key not in self.rules:
+                    self.rules[key] = Achievement(key, f'{n} {name}', [(metric, n)])
+                entries.append((n, self.rules[key]))
+        entries.sort(key = lambda e: e[0])
+        index = self._index[metric] = ([t for t, r in entries], [r for t, r in entries])
+        return index
+
+    def update(self, metric, value):
+        """ metric is now value. Returns the achievements this unlocked (usually none). """
+        index = self._index.get(metric)
+        if index is None:
+            index = self._build(metric)
+        thresholds, rules = index
+        pos = self._pos.get(metric, 0)
+        self._value[metric] = value
+        if pos < len(thresholds) and value >= thresholds[pos]:
+            passed = bisect_right(thresholds, value, pos)
+            self._pos[metric] = passed
+            return self._reached(rules[pos:passed])
+        if pos and value < thresholds[pos - 1]:
+            # gone back down (a reset); sets need their parts reached again
+            self._pos[metric] = bisect_right(thresholds, value, 0, pos)
+        return []
+
+    def update_owned(self, counts):
+        """ update() for every generator's owned count at once (an array, index 0 being
+        clicks), e.g. after loading. Only the generators at or past one of their thresholds
+        are looked at one by one. Returns what unlocked. """
+        counts = np.asarray(counts)
+        passed = np.searchsorted(owned_thresholds, counts, side = 'right')
+        passed[:1] = 0                  # clicks have their own thresholds, below
+        rows = set(np.flatnonzero(passed).tolist())
+        # generators named by other rules (clicks, sets) may have thresholds of any size
+        rows.update(m[1] for m in self._rules_by_metric
+                    if isinstance(m, tuple) and m[1] < len(counts) and counts[m[1]] > 0)
+        unlocked = []
+        for i in sorted(rows):
+            unlocked += self.update(owned(i), int(counts[i]))
+        return unlocked
+
+    def _reached(self, rules):
+        unlocked = []
+        for r in rules:
+            if r.key in self.unlocked:
+                continue
+            if len(r.parts) > 1 and not all(self._value.get(m, 0) >= t for m, t in r.parts):
+                continue
+            self.unlocked[r.key] = self.clock()
+            unlocked.append(r)
+        self.recent += unlocked
+        return unlocked
+
+    def next_threshold(self, metric):
+        """ The value at which metric would next reach something (inf if never). """
+        index = self._index.get(metric)
+        if index is None:
+            index = self._build(metric)
+        pos = self._pos.get(metric, 0)
+        return index[0][pos] if pos < len(index[0]) else float('inf')
+
+    def restart(self):
+        """ The generators were reset: owned counts and the rate are back to 0. """
+        for metric in list(self._pos):
+            if metric != LTWIDGETS:
+                self._pos[metric] = 0
+                self._value[metric] = 0
+        return None
+
+    def drain(self):
+        """ The achievements unlocked since the last drain(), oldest first. """
+        recent, self.recent = self.recent, []
+        return recent
+
+    def title(self, key):
+        rule = self.rules.get(key)
+        if rule is None and key.startswith('owned '):
+            # a per-generator count not looked at yet this session
+            self._build(owned(int(key.split()[1])))
+            rule = self.rules.get(key)
+        return rule.title if rule is not None else key
+
+    def text(self):
+        """ Short summary for the window: how many unlocked, and the latest. """
+        if not self.unlocked:
+            return 'Achievements: none yet'
+        latest = max(self.unlocked, key = self.unlocked.get)
+        return f'Achievements: {len(self.unlocked)}\nLatest: {self.title(latest)}'
@@ -0,0 +1,175 @@
+# pyClicker IDLE game - auto-buyer
+# Buys whatever pays for itself soonest: the generator with the lowest cost of
+# one more divided by the rate it would add (GeneratorBank.ln_gain, the same
+# numbers fastforward.best_value() goes by). Candidates sit in a heap keyed on
+# that payback time, so a decision is a look at the top rather than a pass over
+# the whole catalog.
+#
+# A purchase only changes the payback of the generator bought (the others'
+# costs and rates don't move, and prestige scales every rate alike). It can go
+# either way: the next one costs more, but the one that reaches a milestone
+# adds far more. So whenever the bank reports a row changed (a purchase by the
+# buyer or the player, see GeneratorBank.changed_since), that row gets a fresh
+# entry, and the old one is dropped when it reaches the top. A restart changes
+# every row, and the heap is rebuilt.
+import heapq
+import math
+import weakref
+
+import numpy as np
+
+from bank import change_log
+
+# most purchases made in one call to buy()
+max_batch = 1000
+
+# paybacks (ln) closer than this to the runner-up's are bought one at a time, where the
+# rounding of a run's estimate could put them on the wrong side
+run_margin = 1e-9
+
+# the AutoBuyer payback_first() keeps for each engine it's asked about
+_buyers = weakref.WeakKeyDictionary()
+
+
+def ln_payback(bank, index = None):
+    """ ln(cost of one more / rate it adds) for row index, or an array for every row.
+    inf for what can't be bought or adds nothing (the free Click, rate_base 0). """
+    if index is not None:
+        gain = bank.ln_gain(index)
+        if bank.cost_base[index] <= 0 or not gain > -math.inf:
+            return math.inf
+        return bank.ln_price(index) - gain
+    gain = bank.ln_gain()
+    with np.errstate(invalid = 'ignore'):
+        payback = bank.ln_bulk_cost(1) - gain
+    payback[(bank.cost_base <= 0) | ~(gain > -np.inf) | np.isnan(payback)] = np.inf
+    return payback
+
+
+class AutoBuyer():
+    """ Keeps an Engine's generators ranked by payback time and buys the best.
+
+        >>> buyer = AutoBuyer(game)
+
+        >>> buyer.best()                # (index, ln payback), or None
+
+        >>> buyer.buy()                 # buy while the best is affordable; returns how many
+
+        >>> fast_forward(game, 3600, policy = buyer)    # works as a buy policy too
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.rebuilds = 0
+        self.rebuild()
+        return None
+
+    def rebuild(self):
+        """ Rank every generator from scratch: O(n), done at the start and after a restart. """
+        bank = self.engine.bank
+        payback = ln_payback(bank)
+        live = np.flatnonzero(payback < np.inf)
+        # entries are (payback, index, stamp); only the one matching _stamp[index] is current
+        self._stamp = np.zeros(len(bank), dtype = np.int64)
+        self._heap = list(zip(payback[live].tolist(), live.tolist(), [0] * len(live)))
+        heapq.heapify(self._heap)
+        self._bank = bank
+        self._version = bank.version
+        self.rebuilds += 1
+        return None
+
+    def _catch_up(self):
+        """ Fresh entries for the rows whose prices changed since the last look. """
+        bank = self.engine.bank
+        if bank is self._bank and bank.version == self._version:
+            return None
+        rows = bank.changed_since(self._version) if bank is self._bank else None
+        if rows is None or len(self._heap) > 2 * len(bank) + change_log:
+            # too much changed (or too many dead entries piled up): start over
+            self.rebuild()
+            return None
+        for index in set(rows):
+            self._stamp[index] += 1
+            payback = ln_payback(bank, index)
+            if payback < math.inf:
+                heapq.heappush(self._heap, (payback, index, int(self._stamp[index])))
+        self._version = bank.version
+        return None
+
+    def best(self):
+        """ (index, ln payback) of the generator that pays back soonest, or None. """
+        self._catch_up()
+        heap = self._heap
+        stamp = self._stamp
+        while heap:
+            payback, index, s = heap[0]
+            if stamp[index] == s:
+                return index, payback
+            heapq.heappop(heap)
+        return None
+
+    def runner_up(self):
+        """ ln payback of the second best generator, inf if there isn't one. """
+        if self.best() is None:
+            return math.inf
+        top = heapq.heappop(self._heap)
+        second = self.best()
+        heapq.heappush(self._heap, top)
+        return second[1] if second is not None else math.inf
+
+    def run(self):
+        """ (index, n): the best generator, and how many of it bought one after another
+        would each still be the best buy, or None. Short of a milestone, each one more only
+        adds ln(growth) to the payback, so that's how far it has to go to reach the
+        runner-up; the purchase that reaches a milestone ends a run. """
+        best = self.best()
+        if best is None:
+            return None
+        index, payback = best
+        bank = self.engine.bank
+        every = int(bank.every[index])
+        left = every - 1 - int(bank.owned[index]) % every   # purchases short of a milestone
+        if left <= 1:
+            return index, 1
+        step = math.log(float(bank.growth[index]))
+        room = self.runner_up() - payback - run_margin
+        if not room > 0:
+            return index, 1
+        if step <= 0 or room >= step * (left - 1):
+            return index, left
+        return index, 1 + int(room // step)
+
+    def __call__(self, engine = None):
+        """ As a buy policy (see fastforward.py): the best generator, as many of it as run()
+        allows and can be afforded now; one to save up for when none can. The purchases come
+        out the same as buying one at a time, in fewer steps. """
+        run = self.run()
+        if run is None:
+            return None
+        index, n = run
+        if n > 1:
+            n = max(min(n, self.engine.bank.max_buyable_one(index, self.engine.total.widgets)), 1)
+        return index, n
+
+    def buy(self, most = max_batch):
+        """ Buy the best generator, one at a time, for as long as it's affordable (at most
+        `most` purchases). Stops at the first one that isn't, to save up for it rather than
+        spend on something worse. Returns the number bought. """
+        engine = self.engine
+        bought = 0
+        while bought < most:
+            best = self.best()
+            if best is None or engine.cost(best[0]) > engine.total.widgets or not engine.buy(best[0], 1):
+                break
+            bought += 1
+        return bought
+
+
+def payback_first(engine):
+    """ Buy policy (see fastforward.py): one of whatever pays back soonest. Makes the same
+    choices as fastforward.best_value, from an AutoBuyer kept for the engine rather than a
+    pass over the whole catalog per purchase. """
+    buyer = _buyers.get(engine)
+    if buyer is None:
+        buyer = _buyers[engine] = AutoBuyer(engine)
+    return buyer(engine)
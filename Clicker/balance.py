@@ -0,0 +1,202 @@
+# pyClicker IDLE game - balancing harness
+# Plays batches of seeded games headlessly, spread over every CPU core, and
+# reports how long things take: the first purchase of each item, reaching a
+# prestige bonus, and widgets/hour for each growth roll. Parameter grids can
+# be swept in one run.
+#
+#   python balance.py --games 2000 --hours 24 --policy best_value
+#   python balance.py --set cost_growth=17,18.2,19.5 --set rate_growth=4.5,4.88 --json sweep.json
+import argparse
+import itertools
+import json
+import math
+import multiprocessing
+import random
+import sys
+import time
+
+import numpy as np
+
+import engine
+import fastforward
+from bank import GeneratorBank
+
+policies = {'cheapest': fastforward.cheapest,
+            'best_value': fastforward.best_value,
+            }
+
+defaults = {'cost_growth': engine.cost_growth,
+            'cost_base': engine.cost_base,
+            'rate_growth': engine.rate_growth,
+            'rate_base': engine.rate_base,
+            }
+
+click_speed = (3.0, 8.0)    # clicks/second a player manages at the start, drawn per game
+check_in = 900.0            # average seconds between looks at the game (for restarts)
+
+def new_game(params, seed):
+    """ A fresh Engine using the balancing numbers in params, with its growth roll
+    (and later rolls) drawn from a Random seeded with seed. """
+    rng = random.Random(seed)
+    n = len(engine.items)
+    # the same shape as engine.costs/rates: item 0 is the free Click
+    costs = [0] + [params['cost_base'] * (params['cost_growth'] ** x) for x in range(n - 1)]
+    rates = [0] + [params['rate_base'] * (params['rate_growth'] ** x) for x in range(n - 1)]
+    bank = GeneratorBank(engine.items, cost_base = costs, rate_base = rates,
+                         growth = rng.choice(engine.growth_choices))
+    return engine.Engine(bank, rng = rng)
+
+def prestige_widgets(target):
+    """ Lifetime widgets at which Engine.new_prestige() reaches target. """
+    return (target / 150) ** 2 * 1.0E+14
+
+def play(params, seed, hours, policy, prestige_target):
+    """ One game: click until the first Pencil is affordable, at a clicking speed drawn
+    for the game, then leave it to policy for hours. The player checks in every so often
+    (a random interval, 15 minutes on average) and restarts whenever that would multiply
+    the prestige bonus by prestige_target, so later runs get fresh growth rolls per item.
+    Times in the result are seconds from the start of the game. """
+    game = new_game(params, seed)
+    rng = game.rng
+    growth = game.generators[1].growth
+    clicks = math.ceil(game.generators[1].bulk_cost(1))
+    for _ in range(clicks):
+        game.buy(0)
+    clicking = clicks / rng.uniform(click_speed[0], click_speed[1])
+
+    first = [None] * len(game.generators)
+    events = [(clicking, float(game.total.ltwidgets))]      # lifetime widgets at every purchase
+    clock = clicking
+
+    def on_buy(g, elapsed, index, quantity):
+        if first[index] is None:
+            first[index] = clock + elapsed
+        events.append((clock + elapsed, float(g.total.ltwidgets)))
+
+    seconds = hours * 3600
+    start = float(game.total.ltwidgets)
+    purchases = 0
+    prestiges = 0
+    while clock < seconds:
+        away = min(rng.expovariate(1 / check_in), seconds - clock)
+        _, bought = fastforward.fast_forward(game, away, policies[policy], on_buy = on_buy)
+        purchases += bought
+        clock += away
+        if game.new_prestige() >= prestige_target * max(game.total.prestige, 1):
+            game.prestige()
+            prestiges += 1
+    events.append((seconds, float(game.total.ltwidgets)))
+
+    # production is linear between purchases, so the crossing can be interpolated exactly
+    needed = prestige_widgets(prestige_target)
+    to_prestige = None
+    for (t0, lt0), (t1, lt1) in zip(events, events[1:]):
+        if lt1 >= needed:
+            to_prestige = t0 if lt0 >= needed else t0 + (needed - lt0) / (lt1 - lt0) * (t1 - t0)
+            break
+
+    return {'seed': seed,
+            'growth': growth,
+            'first_purchase': first[1:],
+            'time_to_prestige': to_prestige,
+            'widgets_per_hour': (float(game.total.ltwidgets) - start) / hours,
+            'purchases': purchases,
+            'prestiges': prestiges,
+            }
+
+def _play(task):
+    combo, params, seed, hours, policy, prestige_target = task
+    return combo, play(params, seed, hours, policy, prestige_target)
+
+def _spread(values):
+    """ Distribution summary of a list of numbers (None entries count as not reached). """
+    reached = np.array([v for v in values if v is not None], dtype = float)
+    summary = {'n': len(values), 'reached': len(reached) / len(values) if values else 0.0}
+    if len(reached):
+        p10, p50, p90 = np.percentile(reached, [10, 50, 90])
+        summary.update(mean = float(reached.mean()), p10 = float(p10), p50 = float(p50), p90 = float(p90))
+    return summary
+
+def summarize(results):
+    """ Roll up a list of play() results. """
+    by_growth = {}
+    for r in results:
+        by_growth.setdefault(r['growth'], []).append(r['widgets_per_hour'])
+    return {'games': len(results),
+            'first_purchase': {name: _spread([r['first_purchase'][i] for r in results])
+                               for i, name in enumerate(engine.items[1:])},
+            'time_to_prestige': _spread([r['time_to_prestige'] for r in results]),
+            'widgets_per_hour': {str(g): _spread(v) for g, v in sorted(by_growth.items())},
+            }
+
+def sweep(grid, games, hours, policy, prestige_target, seed = 0, jobs = None):
+    """ Play games seeded games for every combination in grid (name -> list of values,
+    anything missing uses defaults). Returns [(params, summary), ...]. """
+    names = list(grid)
+    combos = [dict(defaults, **dict(zip(names, values))) for values in itertools.product(*grid.values())]
+    tasks = [(c, params, seed + s, hours, policy, prestige_target)
+             for c, params in enumerate(combos) for s in range(games)]
+    results = [[] for _ in combos]
+    jobs = jobs or multiprocessing.cpu_count()
+    if jobs == 1:
+        done = map(_play, tasks)
+    else:
+        pool = multiprocessing.Pool(jobs)
+        done = pool.imap_unordered(_play, tasks, chunksize = max(1, len(tasks) // (jobs * 8)))
+    for combo, result in done:
+        results[combo].append(result)
+    if jobs != 1:
+        pool.close()
+        pool.join()
+    return [(params, summarize(r)) for params, r in zip(combos, results)]
+
+def _hours(seconds):
+    return f'{seconds / 3600:8.2f}h' if seconds is not None else '       -'
+
+def report(params, summary, out = sys.stdout):
+    print(', '.join(f'{k} = {v}' for k, v in params.items()), f"({summary['games']} games)", file = out)
+    print('  first purchase            reached    p10      p50      p90', file = out)
+    for name, s in summary['first_purchase'].items():
+        print(f"    {name:<20} {s['reached']:>7.0%} {_hours(s.get('p10'))} {_hours(s.get('p50'))} "
+              f"{_hours(s.get('p90'))}", file = out)
+    s = summary['time_to_prestige']
+    print(f"  time to prestige         {s['reached']:>7.0%} {_hours(s.get('p10'))} {_hours(s.get('p50'))} "
+          f"{_hours(s.get('p90'))}", file = out)
+    print('  widgets/hour by growth      games        p10          p50          p90', file = out)
+    for g, s in summary['widgets_per_hour'].items():
+        print(f"    ^{g:<8} {s['n']:>16} {s.get('p10', 0):>12.4g} {s.get('p50', 0):>12.4g} "
+              f"{s.get('p90', 0):>12.4g}", file = out)
+    print(file = out)
+
+def _parse_set(text):
+    name, _, values = text.partition('=')
+    if name not in defaults or not values:
+        raise argparse.ArgumentTypeError(f'expected one of {", ".join(defaults)}=v1,v2,... not {text!r}')
+    return name, [float(v) for v in values.split(',')]
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Play seeded pyClicker games in bulk and report on the balance.')
+    parser.add_argument('--games', type = int, default = 1000, help = 'games per parameter combination')
+    parser.add_argument('--hours', type = float, default = 24, help = 'hours of play per game')
+    parser.add_argument('--policy', choices = sorted(policies), default = 'best_value')
+    parser.add_argument('--prestige', type = float, default = 2.0, help = 'prestige bonus to time (default x2)')
+    parser.add_argument('--seed', type = int, default = 0, help = 'first seed; games use seed, seed+1, ...')
+    parser.add_argument('--jobs', type = int, default = None, help = 'worker processes (default: all cores)')
+    parser.add_argument('--set', type = _parse_set, action = 'append', default = [], metavar = 'NAME=V1,V2',
+                        help = 'sweep a balancing number; repeat for a grid')
+    parser.add_argument('--json', help = 'also write the results here')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    results = sweep(dict(args.set), args.games, args.hours, args.policy, args.prestige,
+                    seed = args.seed, jobs = args.jobs)
+    for params, summary in results:
+        report(params, summary)
+    print(f'{sum(s["games"] for p, s in results)} games in {time.perf_counter() - started:.1f}s')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump([{'params': p, 'summary': s} for p, s in results], f, indent = 1)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,349 @@
+# pyClicker IDLE game - generator storage
+# The generators are kept as columns of numpy arrays rather than a list of
+# objects, so a tick (or a price check) is a few vector operations no matter
+# how many items the catalog has.
+import math
+from collections import deque
+
+import numpy as np
+
+import bignum
+import purchase
+
+# The buy button quantities. Their costs are kept precomputed for every generator,
+# so switching between them (or redrawing) doesn't recompute anything.
+LADDER = (1, 10, 25, 100)
+
+# how many price changes changed_since() can look back over
+change_log = 1024
+
+# the per-row arrays, everything but names and the price cache
+columns = ('cost_base', 'rate_base', 'growth', 'widgets', 'lifetime_widgets', 'every', 'factor',
+           'owned', 'multiplier', 'rate')
+
+class GeneratorBank():
+    """ Struct-of-arrays store for every generator in a game. Row i of each array is
+        generator i. engine.Generator is a thin view onto one row.
+
+        >>> bank = GeneratorBank(['Click', 'Pencil'], cost_base = [0, 11.8], rate_base = [0, 3.57])
+
+        >>> bank.set_owned(1, 10)
+
+        >>> bank.tick(prestige = 1, dt = 1)     # run every generator for a second
+    """
+
+    def __init__(self, names = (), cost_base = (), rate_base = (), growth = 1.07, owned = 0, \
+                 widgets = 0, lifetime_widgets = 0, every = 25, factor = 2.0):
+        """ Every argument after names is either one value per generator or a single
+        value used for all of them. multiplier and rate are derived from owned: production
+        is multiplied by factor for every `every` owned (the milestone bonus). """
+        self.names = list(names)
+        n = len(self.names)
+        self.cost_base = self._column(cost_base, n)
+        self.rate_base = self._column(rate_base, n)
+        self.growth = self._column(growth, n)
+        self.widgets = self._column(widgets, n)
+        self.lifetime_widgets = self._column(lifetime_widgets, n)
+        self.every = np.empty(n, dtype = np.int64)
+        self.every[:] = every
+        self.factor = self._column(factor, n)
+        self.owned = np.zeros(n, dtype = np.int64)
+        self.multiplier = np.ones(n)
+        self.rate = np.zeros(n)
+        self.owned[:] = self._column(owned, n)
+        self.recompute_rates()
+        self._new_cache(n)
+        return None
+
+    def _new_cache(self, n):
+        # Price cache, rebuilt for the rows flagged in _stale. Only changing owned, growth
+        # or cost_base (set_owned, set_growth, set_cost_base, reset) flags a row. Single
+        # rows flagged are also listed in _stale_rows, so a purchase doesn't mean a scan
+        # of the whole catalog to find them; None there means scan.
+        self._stale = np.ones(n, dtype = bool)
+        self._any_stale = True
+        self._stale_rows = None
+        self._r_k = np.empty(n)                      # r ** owned
+        self._ln_base = np.empty(n)                  # ln(cost_base * r ** owned)
+        self._ladder = np.empty((n, len(LADDER)))    # bulk_cost(q) for q in LADDER
+        self._ln_ladder = np.empty((n, len(LADDER)))
+        self._ln_gain = np.empty(n)                  # ln of the rate one more would add
+        # every price change bumps version; the latest are logged (row, or None for many rows)
+        self.version = 0
+        self._changes = deque(maxlen = change_log)
+        return None
+
+    def rows(self, start, stop, names = None):
+        """ A GeneratorBank over rows start to stop of this one. Its columns are numpy views,
+        so a change through either bank shows in both; the price cache is its own, so only
+        change prices (owned, growth, cost_base) through the new bank. """
+        view = GeneratorBank.__new__(GeneratorBank)
+        view.names = list(names) if names is not None else self.names[start:stop]
+        for c in columns:
+            setattr(view, c, getattr(self, c)[start:stop])
+        view._new_cache(stop - start)
+        return view
+
+    @staticmethod
+    def _column(values, n):
+        col = np.empty(n)
+        col[:] = values
+        return col
+
+    @classmethod
+    def from_generators(cls, generators):
+        """ Build a bank from anything with the Generator attributes (views, or
+        generators unpickled from an old save). """
+        bank = cls([g.name for g in generators],
+                   cost_base = [g.cost_base for g in generators],
+                   rate_base = [g.rate_base for g in generators],
+                   growth = [g.growth for g in generators],
+                   owned = [g.owned for g in generators],
+                   widgets = [g.widgets for g in generators],
+                   lifetime_widgets = [g.lifetime_widgets for g in generators],
+                   every = [getattr(g, 'every', 25) for g in generators],
+                   factor = [getattr(g, 'factor', 2.0) for g in generators])
+        return bank
+
+    def __len__(self):
+        return len(self.names)
+
+    def recompute_rates(self, index = None):
+        """ multiplier = factor ** (owned // every); rate = rate_base * owned * multiplier.
+        With no index every row is recomputed. """
+        if index is None:
+            index = slice(None)
+        owned = self.owned[index]
+        with np.errstate(over = 'ignore', invalid = 'ignore'):
+            # with the stock milestone, past ~25,000 owned these are inf; total_rate() copes with that
+            self.multiplier[index] = self.factor[index] ** (owned // self.every[index])
+            self.rate[index] = self.rate_base[index] * owned * self.multiplier[index]
+        return None
+
+    def set_owned(self, index, owned):
+        """ Set owned (clamped at 0) for one row, a slice or an index array, and update the rate. """
+        self.owned[index] = np.maximum(owned, 0)
+        self.recompute_rates(index)
+        self._mark_stale(index)
+        return None
+
+    def set_growth(self, index, growth):
+        self.growth[index] = growth
+        self._mark_stale(index)
+        return None
+
+    def set_cost_base(self, index, cost_base):
+        self.cost_base[index] = cost_base
+        self._mark_stale(index)
+        return None
+
+    def _mark_stale(self, index):
+        self._stale[index] = True
+        self._any_stale = True
+        self._log_change(int(index) if isinstance(index, (int, np.integer)) else None)
+        if self._stale_rows is not None:
+            if isinstance(index, (int, np.integer)) and len(self._stale_rows) < 1024:
+                self._stale_rows.append(index)
+            else:
+                self._stale_rows = None
+        return None
+
+    def _log_change(self, index):
+        self.version += 1
+        self._changes.append((self.version, index))
+        return None
+
+    def changed_since(self, version):
+        """ The rows whose owned, growth or cost_base changed since self.version was version
+        (repeats possible), or None when that's further back than the log goes or a change
+        covered several rows at once. """
+        if version == self.version:
+            return []
+        changes = self._changes
+        if not changes or changes[0][0] > version + 1:
+            return None
+        rows = []
+        for v, index in reversed(changes):
+            if v <= version:
+                break
+            if index is None:
+                return None
+            rows.append(index)
+        return rows
+
+    def _refresh_prices(self):
+        """ Rebuild the price cache for stale rows. """
+        if not self._any_stale:
+            return None
+        if self._stale_rows is not None and len(self._stale_rows) == 1 and self._refresh_row(self._stale_rows[0]):
+            self._any_stale = False
+            self._stale_rows = []
+            return None
+        i = np.flatnonzero(self._stale) if self._stale_rows is None else np.array(self._stale_rows, dtype = np.intp)
+        b = self.cost_base[i, None]
+        r = self.growth[i, None]
+        k = self.owned[i, None]
+        ln_r = np.log(r)
+        q = np.array(LADDER)
+        with np.errstate(over = 'ignore', invalid = 'ignore', divide = 'ignore'):
+            r_k = r ** k
+            self._ladder[i] = b * ((r_k * ((r ** q) - 1)) / (r - 1))
+            ln_base = np.log(b) + k * ln_r
+            self._ln_ladder[i] = ln_base + bignum.ln_geometric_sum(ln_r, q)
+            # the milestone multiplier is factored out, so this keeps working past float range
+            k, every, factor = k[:, 0], self.every[i], self.factor[i]
+            milestone = (k + 1) // every - k // every
+            self._ln_gain[i] = np.log(self.rate_base[i] * ((k + 1) * factor ** milestone - k)) + \
+                               (k // every) * np.log(factor)
+        self._r_k[i] = r_k[:, 0]
+        self._ln_base[i] = ln_base[:, 0]
+        self._stale[i] = False
+        self._any_stale = False
+        self._stale_rows = []
+        return None
+
+    def _refresh_row(self, i):
+        """ The price cache for one row (a purchase), in floats, which is several times
+        quicker than the arrays for a single row. Returns False, having changed nothing,
+        when floats won't do (a free row, or past float range); the arrays cope with those. """
+        b, r, k = float(self.cost_base[i]), float(self.growth[i]), int(self.owned[i])
+        every, factor = int(self.every[i]), float(self.factor[i])
+        try:
+            ln_r = math.log(r)
+            r_k = r ** k
+            ln_base = math.log(b) + k * ln_r
+            ln_sum = math.log(math.expm1(ln_r))
+            ladder = [b * ((r_k * ((r ** q) - 1)) / (r - 1)) for q in LADDER]
+            ln_ladder = [ln_base + q * ln_r + math.log(-math.expm1(-q * ln_r)) - ln_sum for q in LADDER]
+            milestone = (k + 1) // every - k // every
+            ln_gain = math.log(float(self.rate_base[i]) * ((k + 1) * factor ** milestone - k)) + \
+                      (k // every) * math.log(factor)
+        except (ValueError, OverflowError, ZeroDivisionError):
+            return False
+        self._ladder[i] = ladder
+        self._ln_ladder[i] = ln_ladder
+        self._r_k[i] = r_k
+        self._ln_base[i] = ln_base
+        self._ln_gain[i] = ln_gain
+        self._stale[i] = False
+        return True
+
+    def tick(self, prestige = 1, dt = 1.0):
+        """ Run every generator for dt seconds. Returns the combined rate (per second,
+        prestige included). The per-generator widget counts are only statistics, so
+        they're allowed to top out at inf; the returned rate never does. """
+        scale = float(prestige * dt)
+        with np.errstate(over = 'ignore'):
+            made = self.rate * scale if np.isfinite(scale) else np.where(self.rate > 0, np.inf, 0.0)
+            self.widgets += made
+            self.lifetime_widgets += made
+        return self.total_rate(prestige)
+
+    def total_rate(self, prestige = 1):
+        """ Combined rate of every generator times prestige; a Big once it's past float range. """
+        tr = float(self.rate.sum())
+        if np.isfinite(tr):
+            return bignum.mul(tr, prestige)
+        ln_rate = self.ln_rate()
+        top = ln_rate.max()
+        total = top + np.log(np.exp(ln_rate - top).sum())
+        return bignum.from_log10(total / np.log(10)) * prestige
+
+    def ln_rate(self):
+        """ ln of each generator's rate, worked out without the multiplier overflowing. """
+        with np.errstate(divide = 'ignore'):
+            return np.log(self.rate_base * self.owned) + (self.owned // self.every) * np.log(self.factor)
+
+    def reset(self, growth):
+        """ Back to nothing owned, with new growth rolls (one per row, or one for all). """
+        self.growth[:] = growth
+        self.widgets[:] = 0
+        self.owned[:] = 0
+        self.multiplier[:] = 1
+        self.rate[:] = 0
+        self._stale[:] = True
+        self._any_stale = True
+        self._stale_rows = None
+        self._log_change(None)
+        return None
+
+    def ln_bulk_cost(self, quantity = 1):
+        """ ln of the cost of quantity more of every generator (-inf for free ones).
+        Good at any size; quantity may be a scalar or one per row. Returns a new array. """
+        self._refresh_prices()
+        if np.isscalar(quantity) and quantity in LADDER:
+            return self._ln_ladder[:, LADDER.index(quantity)].copy()
+        with np.errstate(divide = 'ignore'):
+            return self._ln_base + bignum.ln_geometric_sum(np.log(self.growth), quantity)
+
+    def ln_price(self, index):
+        """ ln of the cost of one more of generator index: the same number ln_bulk_cost(1)
+        has for the row, without copying the whole column. """
+        self._refresh_prices()
+        return float(self._ln_ladder[index, 0])
+
+    def ln_gain(self, index = None):
+        """ ln of the rate one more of generator index would add (or an array for every
+        generator), counting the milestone bonus (doubling at every 25 owned, in the stock
+        game) but not prestige. -inf for generators that add nothing. """
+        self._refresh_prices()
+        if index is not None:
+            return float(self._ln_gain[index])
+        return self._ln_gain.copy()
+
+    def bulk_cost(self, quantity = 1):
+        """ Cost of quantity more of every generator, as floats (inf past float range;
+        use ln_bulk_cost() to compare those). Returns a new array. """
+        self._refresh_prices()
+        if np.isscalar(quantity) and quantity in LADDER:
+            return self._ladder[:, LADDER.index(quantity)].copy()
+        r = self.growth
+        with np.errstate(over = 'ignore', invalid = 'ignore'):
+            return self.cost_base * ((self._r_k * ((r ** quantity) - 1)) / (r - 1))
+
+    def price(self, index, quantity = 1):
+        """ Cost of quantity more of generator index: a float, or a bignum.Big past float range.
+        Ladder quantities are a lookup. """
+        self._refresh_prices()
+        b = float(self.cost_base[index])
+        if b <= 0 or quantity <= 0:
+            return 0.0
+        r = float(self.growth[index])
+        if quantity in LADDER:
+            j = LADDER.index(quantity)
+            c = float(self._ladder[index, j])
+            ln_c = self._ln_ladder[index, j]
+        else:
+            try:
+                c = b * ((float(self._r_k[index]) * ((r ** quantity) - 1)) / (r - 1))
+            except OverflowError:
+                c = np.inf
+            ln_c = None
+        if c != np.inf:
+            return c
+        if ln_c is None:
+            ln_c = self._ln_base[index] + bignum.ln_geometric_sum(np.log(r), quantity)
+        return bignum.from_log10(ln_c / np.log(10))
+
+    def max_buyable(self, amount = 0, rows = slice(None)):
+        """ How many of each generator amount widgets (a float or Big) would buy, in one
+        batched pass over the cached prices. Free generators (cost_base 0) come back as 0.
+        rows (a slice) limits it to part of the bank. Always what buy() can pay for: see
+        purchase.py. """
+        self._refresh_prices()
+        first = rows.indices(len(self))[0]
+        return purchase.max_affordable(amount, self.cost_base[rows], self.growth[rows], self._ln_base[rows],
+                                       self.price, first)
+
+    def max_buyable_one(self, index, amount = 0):
+        """ max_buyable() for a single generator, worked in floats where they suffice. """
+        b = float(self.cost_base[index])
+        if not (amount > 0 and b > 0):
+            return 0
+        self._refresh_prices()
+        return purchase.max_affordable_one(amount, b, float(self.growth[index]), float(self._r_k[index]),
+                                           self._ln_base, self.price, index)
+
+    def affordable(self, amount, quantity = 1):
+        """ Boolean mask of the generators where quantity more can be bought with amount. """
+        return self.max_buyable(amount) >= quantity
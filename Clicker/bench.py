@@ -0,0 +1,224 @@
+# pyClicker IDLE game - benchmarks
+# Times the economy hot paths and the button refresh over catalogs from the
+# stock 18 items up to 100k, headless, and against a withdrawn Tk root when
+# there's a display, plus the game server's batched tick over many games.
+# Results are written as JSON; --compare checks them against an earlier run
+# and fails when anything got slower than --threshold.
+#
+#   python bench.py --json bench.json
+#   python bench.py --compare bench.json --threshold 1.25
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+
+import numpy as np
+
+import engine
+from autobuy import AutoBuyer
+from bank import GeneratorBank
+import fastforward
+from render import BuyButtons, default_page
+import server
+
+default_sizes = (18, 100, 1000, 10000, 100000)
+default_sessions = (1000, 10000)
+
+def make_game(n, seed = 0):
+    """ An Engine with n generators: the stock items, repeated with numbered names,
+    some of each owned and a few hours of widgets to spend. """
+    rng = random.Random(seed)
+    stock = len(engine.items) - 1
+    names = ['Click'] + [f'{engine.items[1 + i % stock]} {i // stock}' for i in range(n - 1)]
+    costs = [0] + [engine.costs[1 + i % stock] for i in range(n - 1)]
+    rates = [0] + [engine.rates[1 + i % stock] for i in range(n - 1)]
+    bank = GeneratorBank(names, cost_base = costs, rate_base = rates,
+                         growth = [rng.choice(engine.growth_choices) for _ in range(n)],
+                         owned = [rng.randrange(0, 60) for _ in range(n)])
+    game = engine.Engine(bank, rng = rng)
+    game.tick(3600)
+    return game
+
+class _FakeButton():
+    """ Stands in for tk.Button when timing the render logic on its own. """
+    def config(self, **changes):
+        pass
+
+def cases(game, folder, tk_root = None):
+    """ (name, function) pairs to time against game. """
+    g = game.generators[len(game.generators) // 2]
+    widgets = game.total.widgets
+    path = os.path.join(folder, f'bench-{len(game.generators)}.dat')
+    game.save(path)
+
+    def set_owned():
+        g.owned = g.owned + 1
+        g.owned = g.owned - 1
+
+    def set_widgets():
+        g.widgets = g.widgets + 1.0
+
+    def buy_and_refresh(buttons):
+        # a purchase invalidates one row; the refresh redraws just that row
+        def run():
+            game.generators[1].owned += 1
+            buttons.refresh(10)
+        return run
+
+    # like the game, only a page of buttons whatever the catalog size
+    page = min(len(game.generators), default_page)
+    fake = BuyButtons(game, [_FakeButton() for _ in range(page)], 'grey20')
+    fake.refresh(10)
+
+    def scroll(buttons):
+        # one row down and back, redrawing the rebound buttons each time
+        def run():
+            buttons.scroll_to(buttons.first + 1)
+            buttons.refresh(10)
+            buttons.scroll_to(buttons.first - 1)
+            buttons.refresh(10)
+        return run
+    buyer = AutoBuyer(game)
+
+    def payback_decision():
+        # the best one bought and sold again: its heap entry goes stale and is redone each way
+        i, payback = buyer.best()
+        game.bank.set_owned(i, game.bank.owned[i] + 1)
+        buyer.best()
+        game.bank.set_owned(i, game.bank.owned[i] - 1)
+        buyer.best()
+
+    found = [
+        ('Generator.bulk_cost', lambda: g.bulk_cost(10)),
+        ('Generator.bulk_cost (uncached qty)', lambda: g.bulk_cost(7)),
+        ('Generator.max_buyable', lambda: g.max_buyable(widgets)),
+        ('Generator.owned setter', set_owned),
+        ('Generator.widgets setter', set_widgets),
+        ('GeneratorBank.max_buyable (all)', lambda: game.bank.max_buyable(widgets)),
+        ('Engine.tick (update_totals)', lambda: game.tick(1)),
+        ('AutoBuyer decision, after a purchase', payback_decision),
+        ('best_value decision (full scan)', lambda: fastforward.best_value(game)),
+        ('update_buy_buttons, nothing changed', lambda: fake.refresh(10)),
+        ('update_buy_buttons, after a purchase', buy_and_refresh(fake)),
+        ('update_buy_buttons, quantity switched', lambda: (fake.refresh(25), fake.refresh(10))),
+        ('update_buy_buttons, scrolled', scroll(fake)),
+        ('save_progress', lambda: game.save(path)),
+        ('load_save', lambda: engine.Engine.load(path)),
+    ]
+    if tk_root is not None:
+        import tkinter as tk
+        real = BuyButtons(game, [tk.Button(tk_root) for _ in range(page)], 'grey20')
+        real.refresh(10)
+
+        def tk_refresh(quantity):
+            def run():
+                real.refresh(quantity)
+                tk_root.update_idletasks()
+            return run
+        found += [
+            ('update_buy_buttons [tk], nothing changed', tk_refresh(10)),
+            ('update_buy_buttons [tk], after a purchase', buy_and_refresh(real)),
+            ('update_buy_buttons [tk], full redraw', lambda: (real.invalidate(), real.refresh(10),
+                                                              tk_root.update_idletasks())),
+        ]
+    return found
+
+def make_pool(sessions, seed = 0):
+    """ A server.SessionPool of stock games, each with a few generators bought. """
+    pool = server.SessionPool(len(engine.items))
+    for s in range(sessions):
+        game = engine.Engine(rng = random.Random(seed + s))
+        game.total.widgets = 1e5
+        game.buy(1, 10)
+        game.buy(2, 1 + s % 5)
+        pool.add(game)
+    return pool
+
+def time_it(fn, budget = 0.2, repeat = 5):
+    """ Seconds per call: (best, median) of repeat runs, each about budget/repeat long. """
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * (budget / repeat) / max(elapsed, 1e-9)))
+    runs = [t / number for t in timer.repeat(repeat = repeat, number = number)]
+    return min(runs), statistics.median(runs), number
+
+def tk_root_or_none():
+    """ A withdrawn Tk root, or None without a display. """
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception:
+        return None
+    root.withdraw()
+    return root
+
+def run(sizes = default_sizes, budget = 0.2, use_tk = True, sessions = default_sessions, out = sys.stdout):
+    root = tk_root_or_none() if use_tk else None
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for n in sizes:
+            game = make_game(n)
+            for name, fn in cases(game, folder, root):
+                best, median, number = time_it(fn, budget)
+                results.append({'case': name, 'size': n, 'best_s': best, 'median_s': median, 'calls': number})
+                print(f'{n:>7} {name:<45} {best * 1e6:>12.2f} us', file = out)
+    for n in sessions:
+        pool = make_pool(n)
+        name = 'SessionPool.tick (size = games)'
+        best, median, number = time_it(lambda: pool.tick(1.0), budget)
+        results.append({'case': name, 'size': n, 'best_s': best, 'median_s': median, 'calls': number})
+        print(f'{n:>7} {name:<45} {best * 1e6:>12.2f} us', file = out)
+    if root is not None:
+        root.destroy()
+    return {'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'tk': root is not None,
+            'when': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'results': results,
+            }
+
+def compare(old, new, threshold):
+    """ The cases that got slower than threshold times the old best. """
+    before = {(r['case'], r['size']): r['best_s'] for r in old['results']}
+    slower = []
+    for r in new['results']:
+        was = before.get((r['case'], r['size']))
+        if was and r['best_s'] > was * threshold:
+            slower.append((r['case'], r['size'], was, r['best_s']))
+    return slower
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Benchmark the pyClicker economy and button refresh.')
+    parser.add_argument('--sizes', type = lambda s: [int(x) for x in s.split(',')], default = default_sizes,
+                        help = 'catalog sizes, comma separated (default %(default)s)')
+    parser.add_argument('--sessions', type = lambda s: [int(x) for x in s.split(',') if x], default = default_sessions,
+                        help = 'game counts for the server tick, comma separated (default %(default)s)')
+    parser.add_argument('--budget', type = float, default = 0.2, help = 'seconds to spend per case')
+    parser.add_argument('--no-tk', action = 'store_true', help = "don't time against real Tk widgets")
+    parser.add_argument('--json', help = 'write the results here')
+    parser.add_argument('--compare', help = 'an earlier --json file to check against')
+    parser.add_argument('--threshold', type = float, default = 1.25,
+                        help = 'how much slower counts as a regression (default %(default)s)')
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.budget, use_tk = not args.no_tk, sessions = args.sessions)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent = 1)
+    if args.compare:
+        with open(args.compare) as f:
+            slower = compare(json.load(f), results, args.threshold)
+        for case, size, was, now in slower:
+            print(f'SLOWER: {case} at {size}: {was * 1e6:.2f} us -> {now * 1e6:.2f} us')
+        return 1 if slower else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
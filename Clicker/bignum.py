@@ -0,0 +1,268 @@
+# pyClicker IDLE game - numbers bigger than a float
+# Late in a run costs go past 1e308, where floats turn into inf (or raise
+# OverflowError for r ** k) and purchases quietly stop working. Big keeps a
+# mantissa and a base 10 exponent. Anything small enough comes back as a plain
+# float, so the game only pays for Big once the numbers actually get huge.
+import math
+import numbers
+import re
+
+import numpy as np
+
+# Results at or above 1e300 stay Big, below it they go back to being floats.
+# Well under the float limit, so adding two of them can't overflow.
+_limit_exp = 300
+
+_ln10 = math.log(10)
+
+class Big():
+    """ m * 10 ** e, with 1 <= |m| < 10 (or m == 0).
+
+        >>> Big(3.0, 400) * 2
+        Big(6.0, 400)
+
+        >>> Big(3.0, 400) / Big(1.5, 398)
+        200.0
+
+        >>> f"{Big(1.23456789, 512):,.6G}"
+        '1.23457E+512'
+    """
+
+    __slots__ = ('m', 'e')
+
+    def __init__(self, m = 0.0, e = 0):
+        """ Not normalized here; use big() or from_log10() to build one from a value. """
+        self.m = m
+        self.e = e
+
+    def __repr__(self):
+        return f'Big({self.m}, {self.e})'
+
+    def __str__(self):
+        return format(self, '.6g')
+
+    def log10(self):
+        """ log10 of the magnitude. """
+        if self.m == 0:
+            return -math.inf
+        return math.log10(abs(self.m)) + self.e
+
+    def __float__(self):
+        if self.e > 308:
+            return math.copysign(math.inf, self.m)
+        return self.m * 10.0 ** self.e
+
+    def __int__(self):
+        if self.e < 308:
+            return int(float(self))
+        return int(self.m * 1e15) * 10 ** (self.e - 15)
+
+    def __bool__(self):
+        return self.m != 0
+
+    def __neg__(self):
+        return Big(-self.m, self.e)
+
+    def __abs__(self):
+        return Big(abs(self.m), self.e)
+
+    def __round__(self, ndigits = None):
+        # nothing this size has a fractional part worth keeping
+        return self if ndigits is not None else int(self)
+
+    def __add__(self, other):
+        other = big(other)
+        if other.m == 0:
+            return _make(self.m, self.e)
+        if self.m == 0:
+            return _make(other.m, other.e)
+        a, b = (self, other) if self.e >= other.e else (other, self)
+        d = a.e - b.e
+        if d > 17:
+            return _make(a.m, a.e)
+        return _make(a.m + b.m * 10.0 ** -d, a.e)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return self + -big(other)
+
+    def __rsub__(self, other):
+        return big(other) + -self
+
+    def __mul__(self, other):
+        other = big(other)
+        return _make(self.m * other.m, self.e + other.e)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        other = big(other)
+        if other.m == 0:
+            raise ZeroDivisionError('Big division by zero')
+        return _make(self.m / other.m, self.e - other.e)
+
+    def __rtruediv__(self, other):
+        return big(other) / self
+
+    def __pow__(self, p):
+        if self.m == 0:
+            return 0.0
+        if self.m < 0:
+            return float(self) ** p
+        return from_log10(self.log10() * p)
+
+    def _cmp(self, other):
+        """ -1, 0 or 1 for self against other, or NotImplemented when other isn't a number
+        (so == None is False rather than an error). """
+        if not isinstance(other, (Big, numbers.Real)):
+            return NotImplemented
+        if isinstance(other, float) and math.isinf(other):
+            return -1 if other > 0 else 1
+        other = big(other)
+        sa, sb = _sign(self.m), _sign(other.m)
+        if sa != sb:
+            return -1 if sa < sb else 1
+        if sa == 0:
+            return 0
+        # same sign: compare magnitudes, flipped for negatives
+        a, b = (self.e, abs(self.m)), (other.e, abs(other.m))
+        if a == b:
+            return 0
+        return sa if a > b else -sa
+
+    def __eq__(self, other):
+        c = self._cmp(other)
+        return c if c is NotImplemented else c == 0
+
+    def __ne__(self, other):
+        c = self._cmp(other)
+        return c if c is NotImplemented else c != 0
+
+    def __lt__(self, other):
+        c = self._cmp(other)
+        return c if c is NotImplemented else c < 0
+
+    def __le__(self, other):
+        c = self._cmp(other)
+        return c if c is NotImplemented else c <= 0
+
+    def __gt__(self, other):
+        c = self._cmp(other)
+        return c if c is NotImplemented else c > 0
+
+    def __ge__(self, other):
+        c = self._cmp(other)
+        return c if c is NotImplemented else c >= 0
+
+    def __hash__(self):
+        return hash((self.m, self.e))
+
+    def __format__(self, spec):
+        """ Always scientific. Understands the fill/align/sign/width/,/precision parts of
+        a float format spec, so the game's f-strings work unchanged. """
+        f = _spec.fullmatch(spec)
+        if not f:
+            raise ValueError(f'Invalid format specifier {spec!r} for Big')
+        fill_align, sign, width, precision, kind = f.group('align', 'sign', 'width', 'precision', 'kind')
+        precision = 6 if precision is None else int(precision)
+        kind = kind or 'g'
+        digits = max(precision - 1, 0) if kind in 'gG' else precision
+        m, e = abs(self.m), self.e
+        mant = f'{m:.{digits}f}'
+        if mant.startswith('10'):
+            mant = f'{m / 10:.{digits}f}'
+            e += 1
+        if kind in 'gG' and '.' in mant:
+            mant = mant.rstrip('0').rstrip('.')
+        s = f"{mant}{'E' if kind in 'EG' else 'e'}{e:+d}"
+        if self.m < 0:
+            s = '-' + s
+        elif sign in ('+', ' '):
+            s = sign + s
+        return format(s, f"{fill_align or '>'}{width or ''}")
+
+_spec = re.compile(r'(?P<align>.?[<>=^])?(?P<sign>[-+ ])?(?P<width>\d+)?,?(?:\.(?P<precision>\d+))?(?P<kind>[eEgGfF%n])?')
+
+def _sign(x):
+    return (x > 0) - (x < 0)
+
+def _make(m, e):
+    """ Normalize m * 10 ** e, handing back a float when it fits comfortably. """
+    m = float(m)
+    if m == 0:
+        return 0.0
+    shift = math.floor(math.log10(abs(m)))
+    m /= 10.0 ** shift
+    e += shift
+    if e < _limit_exp:
+        return m * 10.0 ** e
+    return Big(m, e)
+
+def big(x):
+    """ x as a Big (normalized), whatever it was. """
+    if isinstance(x, Big):
+        return x
+    x = float(x)
+    if x == 0:
+        return Big(0.0, 0)
+    if math.isinf(x) or math.isnan(x):
+        raise OverflowError(f'{x} cannot be made a Big')
+    e = math.floor(math.log10(abs(x)))
+    return Big(x / 10.0 ** e, e)
+
+def from_log10(x):
+    """ 10 ** x, as a float if it fits, otherwise a Big. """
+    x = float(x)
+    if x == -math.inf:
+        return 0.0
+    e = math.floor(x)
+    if e < _limit_exp:
+        return 10.0 ** x
+    return Big(10.0 ** (x - e), e)
+
+def log10(x):
+    if isinstance(x, Big):
+        return x.log10()
+    return math.log10(x) if x > 0 else -math.inf
+
+def ln(x):
+    return log10(x) * _ln10
+
+def sqrt(x):
+    if isinstance(x, Big):
+        return from_log10(x.log10() / 2)
+    return math.sqrt(x)
+
+def isfinite(x):
+    return isinstance(x, Big) or math.isfinite(x)
+
+def add(a, b):
+    """ a + b, switching to Big instead of overflowing to inf. """
+    s = a + b
+    if isinstance(s, float) and math.isinf(s) and math.isfinite(a) and math.isfinite(b):
+        # only plain floats can come out as inf, Big arithmetic never does
+        return big(a) + big(b)
+    return s
+
+def mul(a, b):
+    """ a * b, switching to Big instead of overflowing to inf. """
+    p = a * b
+    if isinstance(p, float) and math.isinf(p) and math.isfinite(a) and math.isfinite(b):
+        return big(a) * big(b)
+    return p
+
+def floor(x):
+    """ Whole widgets for display: an int for ordinary numbers, Big ones are left alone. """
+    return x if isinstance(x, Big) else int(x)
+
+# ################################
+# Vectorized helpers for the GeneratorBank columns. These work in natural logs,
+# so nothing in them can overflow: multiply is +, pow is *, add is np.logaddexp
+# and compare is compare.
+
+def ln_geometric_sum(ln_r, quantity):
+    """ ln((r ** quantity - 1) / (r - 1)) for arrays of ln(r) (r > 1). """
+    x = quantity * ln_r
+    with np.errstate(divide = 'ignore'):
+        return x + np.log(-np.expm1(-x)) - np.log(np.expm1(ln_r))
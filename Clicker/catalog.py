@@ -0,0 +1,203 @@
+# pyClicker IDLE game - item catalogs
+# What can be bought: names, base cost and rate, the growth rolls each item
+# can get and its milestone bonus (the stock game doubles production every 25
+# owned). The stock catalog is built from the balancing numbers in engine.py.
+# Designers can ship their own as JSON:
+#
+#   {"defaults": {"growth": [1.07, 1.075, 1.08, 1.085, 1.09],
+#                 "milestone": {"every": 25, "factor": 2}},
+#    "items": [{"name": "Click", "cost_base": 0, "rate_base": 0},
+#              {"name": "Pencil", "cost_base": 11.8, "rate_base": 3.57,
+#               "growth": {"min": 1.07, "max": 1.09, "step": 0.005},
+#               "milestone": {"every": 10, "factor": 3}},
+#              ...]}
+#
+# The first time a JSON catalog is loaded it's compiled into a .npy table next
+# to it (one fixed-size record per item). Later runs memory-map that instead,
+# so a 10k item catalog starts without parsing or building anything per item.
+import json
+import os
+
+import numpy as np
+
+from bank import GeneratorBank
+
+# the stock growth rolls, and the milestone every item gets unless told otherwise
+default_growth = (1.07, 1.075, 1.08, 1.085, 1.09)
+default_milestone = (25, 2.0)
+
+# most growth rolls one item can have
+max_growth_choices = 8
+
+
+class CatalogError(ValueError):
+    """ A catalog file that can't be used. .path is the file, when known. """
+    path = None
+
+
+def _record(name_width):
+    return np.dtype([('name', f'<U{max(name_width, 1)}'),
+                     ('cost_base', '<f8'),
+                     ('rate_base', '<f8'),
+                     ('growth', '<f8', (max_growth_choices,)),
+                     ('growth_n', '<i4'),
+                     ('every', '<i8'),
+                     ('factor', '<f8')])
+
+
+class Catalog():
+    """ The items a game is played with, as a numpy record array (one row per item,
+        row 0 being the free Click).
+
+        >>> stock = Catalog.from_items(['Click', 'Pencil'], cost_base = [0, 11.8], rate_base = [0, 3.57])
+
+        >>> tools = Catalog.load('tools.json')      # compiles tools.npy the first time
+
+        >>> game = Engine(catalog = tools)
+    """
+
+    def __init__(self, table):
+        self.table = table
+        return None
+
+    def __len__(self):
+        return len(self.table)
+
+    @property
+    def names(self):
+        return self.table['name'].tolist()
+
+    @classmethod
+    def from_items(cls, names, cost_base, rate_base, growth = default_growth, every = default_milestone[0], \
+                   factor = default_milestone[1]):
+        """ A catalog from columns. growth is the list of rolls, shared by every item;
+        every and factor are one per item or one for all. """
+        growth = _growth_choices(growth)
+        table = np.zeros(len(names), dtype = _record(max((len(x) for x in names), default = 1)))
+        table['name'] = names
+        table['cost_base'] = cost_base
+        table['rate_base'] = rate_base
+        table['growth'][:, :len(growth)] = growth
+        table['growth_n'] = len(growth)
+        table['every'] = every
+        table['factor'] = factor
+        return cls(table)
+
+    @classmethod
+    def from_bank(cls, bank):
+        """ A catalog matching a bank made without one (e.g. from an old save): its own
+        numbers, with the stock growth rolls. """
+        return cls.from_items(bank.names, bank.cost_base, bank.rate_base, every = bank.every, factor = bank.factor)
+
+    @classmethod
+    def from_json(cls, path):
+        """ Parse a JSON catalog (see the top of this file). Raises CatalogError. """
+        try:
+            with open(path, encoding = 'utf-8') as f:
+                spec = json.load(f)
+            defaults = spec.get('defaults', {})
+            growth = _growth_choices(defaults.get('growth', default_growth))
+            every, factor = _milestone(defaults.get('milestone'), default_milestone)
+            entries = spec['items']
+            table = np.zeros(len(entries), dtype = _record(max((len(e['name']) for e in entries), default = 1)))
+            for i, e in enumerate(entries):
+                choices = _growth_choices(e['growth']) if 'growth' in e else growth
+                row = table[i]
+                row['name'] = e['name']
+                row['cost_base'] = float(e['cost_base'])
+                row['rate_base'] = float(e['rate_base'])
+                row['growth'][:len(choices)] = choices
+                row['growth_n'] = len(choices)
+                row['every'], row['factor'] = _milestone(e.get('milestone'), (every, factor))
+        except CatalogError as e:
+            e.path = path
+            raise
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            error = CatalogError(f'{path} is not a catalog we can read ({e!r})')
+            error.path = path
+            raise error from e
+        return cls(table)
+
+    def compile(self, path):
+        """ Write the table as a .npy file, for load() to memory-map. """
+        folder = os.path.dirname(os.path.abspath(path))
+        tmp = os.path.join(folder, f'.{os.path.basename(path)}.tmp')
+        with open(tmp, 'wb') as f:
+            np.save(f, self.table, allow_pickle = False)
+        os.replace(tmp, path)
+        return None
+
+    @classmethod
+    def load(cls, path):
+        """ A catalog from a .npy table or a JSON file. A JSON catalog is compiled to a .npy
+        beside it, which is used instead for as long as it's newer than the JSON. The table
+        is mapped copy-on-write: pages are read as they're touched, and nothing is written back. """
+        base, ext = os.path.splitext(path)
+        if ext.lower() != '.json':
+            return cls(_map(path))
+        compiled = base + '.npy'
+        try:
+            if os.path.getmtime(compiled) >= os.path.getmtime(path):
+                return cls(_map(compiled))
+        except (OSError, CatalogError):
+            pass
+        catalog = cls.from_json(path)
+        try:
+            catalog.compile(compiled)
+        except OSError:
+            pass                    # a read-only install still works, it just parses every time
+        return catalog
+
+    def roll_growth(self, rng, shared = False):
+        """ A growth roll for every item, drawn with rng (a random.Random). shared draws once
+        and puts every item at the same place in its range (the stock game's single roll for
+        a new game); otherwise each item rolls for itself. """
+        n = self.table['growth_n']
+        if shared:
+            top = int(n.max()) if len(n) else 1
+            pick = rng.randrange(top) * n // top
+        else:
+            pick = np.array([rng.randrange(c) for c in n.tolist()], dtype = np.int64)
+        return self.table['growth'][np.arange(len(n)), pick]
+
+    def bank(self, rng, shared = True):
+        """ A new GeneratorBank for these items, with growth rolled by roll_growth(). """
+        t = self.table
+        return GeneratorBank(self.names, cost_base = t['cost_base'], rate_base = t['rate_base'],
+                             growth = self.roll_growth(rng, shared), every = t['every'], factor = t['factor'])
+
+
+def _map(path):
+    try:
+        table = np.load(path, mmap_mode = 'c', allow_pickle = False)
+    except (ValueError, EOFError) as e:
+        error = CatalogError(f'{path} is not a compiled catalog ({e})')
+        error.path = path
+        raise error from e
+    if table.dtype.names != _record(1).names:
+        error = CatalogError(f'{path} is not a compiled catalog (fields {table.dtype.names})')
+        error.path = path
+        raise error
+    return table
+
+def _growth_choices(spec):
+    """ A list of growth rolls, from a list or {'min': .., 'max': .., 'step': ..}. """
+    if isinstance(spec, dict):
+        steps = int(round((spec['max'] - spec['min']) / spec['step'])) + 1
+        spec = [round(spec['min'] + k * spec['step'], 9) for k in range(steps)]
+    choices = [float(g) for g in spec]
+    if not 0 < len(choices) <= max_growth_choices:
+        raise CatalogError(f'an item needs 1 to {max_growth_choices} growth rolls, not {len(choices)}')
+    if min(choices) <= 1:
+        raise CatalogError(f'growth rolls must be more than 1, not {min(choices)}')
+    return choices
+
+def _milestone(spec, default):
+    """ (every, factor) from {'every': .., 'factor': ..}, anything missing taken from default. """
+    if spec is None:
+        return default
+    every = int(spec.get('every', default[0]))
+    factor = float(spec.get('factor', default[1]))
+    if every < 1 or factor <= 0:
+        raise CatalogError(f'a milestone needs every >= 1 and factor > 0, not {spec}')
+    return every, factor
@@ -1,159 +1,48 @@
 # pyClicker IDLE game
 # 2020-10-16
-import itertools
 import time
+started = time.perf_counter()       # for --startup-time
+import argparse
+import os
+import random
+import sys
+import threading
+import traceback
 import tkinter as tk
-from tkinter import messagebox
 from tkinter import font
-import random
-import math
-import pickle
-
-savefile = 'clickersave.pkl'
-
-class Generator():
-    """ Generator() class for clicker game items.
-        Create a list of class instances, with supporting functions, to make a complete game.
-
-        >>> items = ['Click', 'Pencil', 'Pen, 'Stick']
-
-        >>> costs = [ (4 * (11 ** x) ) for x in range( len(items) ) ]
 
-        >>> costs.insert(0,0)
+from engine import Engine, BUY_MAX
+import engine
+import saves
+from scheduler import Scheduler
+from profiler import Profiler, StartupTimer
+import bignum
+from catalog import Catalog, CatalogError
+from journal import Journal
+from render import BuyButtons, HistoryGraph, default_page
+from history import History
+from planner import Planner, duration
+from autobuy import AutoBuyer, payback_first
+
+# What gets bought for you while the game is closed (None to just save up widgets).
+# Any function taking the Engine and returning (index, quantity) will do. payback_first
+# buys what fastforward.best_value would, without a pass over the catalog per purchase.
+offline_policy = payback_first
+
+# How often the game is saved while playing, in ms. It's also saved on quit.
+autosave_interval = 60 * 1000
+
+# The economy runs in fixed steps of sim_step seconds, however busy the window is.
+# The display is redrawn at most frame_rate times a second.
+sim_step = 1.0
+frame_rate = 4
+
+# Buy buttons on screen at once. Longer catalogs scroll through the same buttons.
+buttons_per_page = default_page
+
+# How often (ms) startup looks to see whether the save has finished loading.
+load_poll = 20
 
-        >>> rates = [ (2.5 * (8 ** x) ) for x in range( len(items) ) ]
-
-        >>> rates.insert(0,0)       
-
-        >>> generators = [Generator(name = item, cost_base = cb, rate_base = rb, growth = gr) \
-                         for item, cb, rb, gr in zip(items, costs, rates,  \
-                         random.choice([1.07, 1.075, 1.08, 1.085, 1.09]) ]
-
-                    """
-    
-    def __init__(self, name = '', cost_base = 1, rate_base = 1, growth = 1.07, widgets = 0, \
-                 lifetime_widgets = 0, owned = 0 ):
-        """ Initialize instance variables. multiplier and rate are updated with the self.owned setter.
-        Should specify at least name, cost_base and rate_base to start. """
-
-        self.name = name
-        self.cost_base = cost_base
-        self.rate_base = rate_base
-        self.growth = growth
-        self.lifetime_widgets = lifetime_widgets 
-        self.widgets = widgets         
-        self.owned = owned
-        self.multiplier = (2**(self.owned // 25))
-        self.rate = self.rate_base * self.owned * self.multiplier
-        return None
-
-    @property
-    def widgets(self):
-        return self._widgets
-    
-    @widgets.setter
-    def widgets(self, quantity = 0):
-        """ This .setter assumes that if self.widgets is being set, it's either incrementing 
-        by a rate, or being reset to 0. self.lifetime widgets gets incremented as well, by self.rate.
-        This does create the possibility that setting self.widgets to a non-zero value could 
-        incorrectly increment lifetime_widgets. """
-        if quantity > 0:
-            self.lifetime_widgets += self.rate  
-            self._widgets = quantity 
-        elif quantity == 0:
-            self._widgets = 0
-
-        
-    
-    def reset(self, growth = 1.07, widgets = 0, owned = 0):
-        """ Helper to reset appropriate values to start over."""
-        self.growth = growth
-        self.widgets = widgets
-        self.owned = owned
-        self.rate = 0
-        self.multiplier = 1
-        return None
-
-
-    def bulk_cost(self, quantity = 1):
-        """ Returns the cost of quantity items. Exponential growth on cost. """
-        max(quantity,0)
-        k = self.owned
-        r = self.growth
-        b = self.cost_base
-        c = b * (((r ** k) * ((r ** quantity) -1)) / (r - 1))
-        return c
-
-    def max_buyable(self, amount = 0):
-        """returns the maximum widgets which can be bought with amount. 
-        (usually some total of widgets available)"""
-        maxb = 0
-        if amount and self.cost_base > 0:
-            c = amount
-            k = self.owned
-            r = self.growth
-            b = self.cost_base
-            try: 
-                maxb = math.floor(math.log(((c * (r - 1)) / (b * (r ** k))) + 1 ,r))
-            except:
-                return 0
-        return maxb
-        
-        
-    @property
-    def owned(self):
-        return self._owned
-
-    @owned.setter
-    def owned(self,x):
-        """ sets the self.owned property and updates self.multipler and self.rate. 
-        self.multiplier doubles for every 25 owned."""
-        if x <= 0:
-            self._owned = 0
-        else:
-            self._owned = x
-            self.multiplier = (2**(self.owned // 25)) 
-            self.rate = self.rate_base * self.owned * self.multiplier
-        return None
-    	
-    def __str__(self):
-        return f'Name: {self.name},\n  - growth:{self.growth},\n' \
-               f'  - owned:{self.owned},\n' \
-               f'  - multiplier:{self.multiplier},\n  - rate:{self.rate},\n' \
-               f'  - widgets:{self.widgets}\n' \
-               f'  - l/t widgets:{self.lifetime_widgets},\n  - cost base:{self.cost_base},\n' \
-               f'  - rate base:{self.rate_base}'
-    def __repr__(self):
-        return f'Generator(name = {self.name}, cost_base = {self.cost_base}, rate_base = {self.rate_base}, ' \
-               f'growth = {self.growth}, widgets = {self.widgets}, ' \
-               f'lifetime_widgets = {self.lifetime_widgets}, owned = {self.owned})'
-
-    
-# ################################
-# Balancing with these numbers:
-#  - cost_growth: The factor by which each level of item is more expensive than the previous item
-#  - rate_growth: the factor by which each rate of production is greater than the previous items's rate
-#  - cost_base: the cost of the least expensive item
-#  - rate_base: the production rate of starting item
-#  
-# add new items by simply expanding this list.
-items = ['Click', 'Pencil', 
-         'Pen', 'Tape', 
-         'Stapler', 'Ruler', 
-         'Square', 'Divider', 
-         'Knife', 'Slide Rule', 
-         'Hammer', 'Screwdriver', 
-         'Caliper', 'Clamp',
-         'Drill', 'Nailgun',
-         'Grinder', 'Drill Press' ]
-cost_growth = 18.2
-cost_base = 11.8
-rate_growth = 4.88
-rate_base = 3.57
-costs = [ (cost_base * (cost_growth ** x) ) for x in range( len(items) ) ]
-costs.insert(0,0)
-rates = [ (rate_base * (rate_growth ** x) ) for x in range( len(items) ) ]
-rates.insert(0,0)
 # mapping some tkinter color codes
 color = {'nearblack': 'grey2', 
          'deepgrey': 'grey15', 
@@ -173,110 +62,180 @@ color = {'nearblack': 'grey2',
 
 ################################
 
-class Total():
-    
-    def __init__(self):
-        self.widgets = 0
-        self.rate = 0
-        self.idle_widgets = 0
-        self.prestige = 1
-        self.spent = 0
-        self.ltwidgets = 0
-        return None
-
 class Clicker(tk.Frame):
     """ Tkinter app frame to display the clicker game. """
     
-    # TODO: Achievements
-    # when rate = 1,000,000
-    # clicks = 100, 250, 500, 1000
-    # each item = 100, 250, 500
-    # pencil, tape and square = 20, "basics"
-    # etc
-    #       
     #producers = dict(zip(items,tuple(zip(costs,rates,itertools.repeat(0)))))
     #items = list(producers.keys())
     
 
 
 
-    def __init__(self, master=None):
+    def __init__(self, master=None, profiler=None, catalog=None, journal=None, seed=None, startup=None):
         
         super().__init__(master)
+        self.catalog = catalog      # a catalog.Catalog, or None for the stock items
+        self.journal = journal      # a journal.Journal recording this session, or None
+        self.rng = random.Random(seed)  # growth rolls; seeded, a run can be repeated
+        self.startup = startup if startup is not None else StartupTimer()
+        # With profiling on, the phases of the game loop are timed. Off, wrap() is a no-op.
+        self.profiler = profiler if profiler is not None else Profiler()
+        for phase in ('update_totals', 'get_status_text', 'update_buy_buttons',
+                      'get_reset_button_text', 'new_prestige'):
+            setattr(self, phase, self.profiler.wrap(phase, getattr(self, phase)))
+        self.tk_redraw = self.profiler.wrap('tk redraw', self.update_idletasks)
         self.master = master
         self.master.protocol("WM_DELETE_WINDOW", self.on_closing)
-        self.total = Total()
         self.buy_quantity_selection = []   #will be a list of tk.Radiobuttons later
         self.buy_quantity = tk.IntVar(value = 1)
-        self.status_label = tk.StringVar(value = '')
-        #self.generators = []
+        self.status_label = tk.StringVar(value = ' Loading...')
+        self.achievement_label = tk.StringVar(value = '')
+        self.auto_buy = tk.BooleanVar(value = False)
+        self.graph = None
+        self.engine = None
+        self.scheduler = None
+
+        # Startup is staged so the window shows straight away: just the status label at
+        # first, while the save is read and the time away credited on a worker thread.
+        # The rest of the widgets are built once that's done, and the idle popup last.
+        top = self.winfo_toplevel()
+        top.config(bg = color['deepgrey'], padx = 20, pady = 20)
+        self.make_status_label(top)
+        self.status.bind('<Expose>', lambda e: self.startup.mark('first frame'))
+        self.loaded = None
+        self.load_error = None
+        self.loader = threading.Thread(target = self.load_in_background, name = 'load', daemon = True)
+        self.loader.start()
+        self.after(load_poll, self.finish_loading)
+
+    def load_in_background(self):
+        """ Runs on the loader thread: the save, the time away, and everything worked out
+        from the whole catalog up front. Nothing in here may touch Tk. """
+        try:
+            game = Engine.load(policy = offline_policy, catalog = self.catalog, rng = self.rng)
+            self.loaded = self.prepare(game if game is not None else Engine(catalog = self.catalog, rng = self.rng))
+        except Exception as e:
+            # anything at all: left unhandled, the window would sit on "Loading..." for good.
+            # load_save() reports it on the Tk thread and a new game is started.
+            if not isinstance(e, saves.SaveError):
+                traceback.print_exc()
+            self.load_error = e
+        return None
 
+    def prepare(self, game):
+        """ Attach the history, planner and auto-buyer to game (see history.py, planner.py
+        and autobuy.py). The first restart plan is worked out here too. """
+        if game.history is None:
+            # production statistics for the graph (F11); kept in the save from now on
+            game.history = History(len(game.bank))
+        # when restarting pays best, assuming offline_policy's buying
+        self.planner = Planner(game, policy = offline_policy)
+        self.planner.plan(wait = True)
+        # auto-buy: each step, buy whatever pays for itself soonest
+        self.autobuyer = AutoBuyer(game)
+        return game
+
+    def finish_loading(self):
+        """ Back on the Tk thread, once the loader is done: start the game and build the
+        rest of the window. """
+        if self.loader.is_alive():
+            self.after(load_poll, self.finish_loading)
+            return None
+        self.startup.mark('save loaded')
         if not self.load_save():
-            self.generators = [Generator(name = item, cost_base = cb, rate_base = rb, growth = gr) \
-                              for item, cb, rb, gr in zip(items, costs, rates,  \
-                              itertools.repeat(random.choice([1.07, 1.075, 1.08, 1.085, 1.09]))) ]
-
-        #if not self.load_save():
-        #    for item, rb, cb in zip(items, rates, costs):
-        #        gr = random.choice([1.07, 1.075, 1.08, 1.085, 1.09])
-        #        self.generators.append(Generator(name = item, cost_base = cb, rate_base = rb, growth = gr))
-    
-        self.create_widgets()
+            self.engine = self.prepare(Engine(catalog = self.catalog, rng = self.rng))
+        if self.journal is not None:
+            self.journal.start(self.engine)
+        self.master.title(f"PyClicker IDLE game. (x{self.total.prestige})")
+
+        self.autosaver = saves.Autosaver(engine.savefile)
+        self.after_idle(self.create_widgets)
+        self.autosaveid = self.after(autosave_interval, self.autosave)
+        return None
+
+    # The economy lives on the engine; these keep the view code reading naturally.
+    @property
+    def generators(self):
+        return self.engine.generators
+
+    @property
+    def total(self):
+        return self.engine.total
 
-    
     def new_prestige(self):
-        tl = self.total.ltwidgets
-        if tl <= 1000:
-            return 1
-        try:
-            xx = max(150 * (math.sqrt(tl / 1.0E+14)),1.0)
-        except:
-            return max(self.total.prestige,1)
-        return round(xx,2) 
+        return self.engine.new_prestige()
           
     def on_closing(self):
-        if tk.messagebox.askokcancel("Quit", "      Do you really want to quit?\n  ( Your progress will be saved and \nwidgets will be made in your absence.)"):
-            self.status.after_cancel(self.updateid)
+        if self.scheduler is None:
+            # still starting up: nothing has been played, so the save is left as it was
+            self.master.destroy()
+            return None
+        from tkinter import messagebox
+        if messagebox.askokcancel("Quit", "      Do you really want to quit?\n  ( Your progress will be saved and \nwidgets will be made in your absence.)"):
+            self.scheduler.stop()
+            self.after_cancel(self.autosaveid)
+            self.autosaver.stop()
+            if self.journal is not None:
+                self.journal.close(self.engine)
             self.save_progress()
             self.master.destroy()
 
-    def update_totals(self):
-        tw = 0
-        for g in self.generators:
-            g.widgets += g.rate * self.total.prestige
-            tw += g.rate * self.total.prestige
-
-        self.total.rate = int(tw) 
-        self.total.widgets += int(tw)
-        self.total.ltwidgets += int(tw)        
+    def autosave(self):
+        # the snapshot is a quick copy taken here; the writing happens on the autosave thread
+        if self.autosaver.error is not None:
+            print(f'autosave to {self.autosaver.path} failed: {self.autosaver.error}', file = sys.stderr)
+        self.autosaver.submit(self.engine.snapshot())
+        if self.journal is not None:
+            self.journal.checkpoint(self.engine)
+        self.autosaveid = self.after(autosave_interval, self.autosave)
+
+    def update_totals(self, dt = 1.0):
+        self.engine.tick(dt)
+        if self.auto_buy.get():
+            self.autobuyer.buy()
         return None
         
     def get_status_text(self):
         tw = self.total.widgets
         tr = self.total.rate
 
-        return f" Widgets:  {int(tw):>17,.8g}\n" \
+        text = f" Widgets:  {bignum.floor(tw):>17,.8g}\n" \
                f" Rate: {round(tr,2):>26,.8g} /s"
+        if self.autosaver.error is not None:
+            text += "\n Autosave failed, see the console"
+        return text
 
     def update(self):
-        self.update_totals()
-        self.status_label.set(self.get_status_text())
-        self.update_buy_buttons()
-        self.reset_text.set(self.get_reset_button_text())
-
-        # Let's reschedule an update in >= 1 second. No, it's not recursive. 
-        self.updateid = self.status.after(1000, self.update)
+        """ Redraw from the engine. The scheduler calls this at frame_rate; the
+        economy itself is advanced separately, by update_totals(). """
+        self.set_if_changed(self.status_label, self.get_status_text())
+        if self.engine.achievements.drain() or not self.achievement_label.get():
+            self.set_if_changed(self.achievement_label, self.engine.achievements.text())
+        self.profiler.count('button reconfigure', self.update_buy_buttons())
+        self.set_if_changed(self.reset_text, self.get_reset_button_text())
+        if self.graph is not None and self.graph_window.state() != 'withdrawn':
+            self.graph.refresh()
+            self.set_if_changed(self.graph_caption, self.graph.caption())
+        if self.profiler:
+            # draw now rather than at idle, so Tk's share of the frame can be timed
+            self.tk_redraw()
+
+    def set_if_changed(self, var, text):
+        if var.get() != text:
+            var.set(text)
+            self.profiler.count('label reconfigure')
 
     def make_buybuttons(self,parent):
+        """ Only a page of buttons is made, however long the catalog; scrolling rebinds
+        them to other generators (see render.BuyButtons). """
         self.buy_button = []
         defaultfont = tk.font.Font(family = 'Candara', size = '10',weight = 'bold')
 
-        for i, x in enumerate(self.generators):
-            numitems = len(self.generators)
-            col = i // (numitems // 2)
-            row = i + 2 if i < (numitems // 2) else (i - (numitems // 2)) + 2
-            # c = x.bulk_cost()
-            # exp = x.growth
+        slots = min(len(self.generators), buttons_per_page)
+        per_column = -(-slots // 2)
+        for i in range(slots):
+            col = i // per_column
+            row = i % per_column + 2
             self.buy_button.append(tk.Button(parent, 
                                              text = "",
                                              fg = color['buybuttontext'], 
@@ -285,34 +244,49 @@ class Clicker(tk.Frame):
                                              width = 32, 
                                              height = 2,
                                              pady = 5, 
-                                             command = lambda y = x: self.buy(item = y, quantity = self.buy_quantity.get())))
-            self.update_buy_buttons()
+                                             command = lambda y = i: self.buy(index = self.buy_buttons.index(y),
+                                                                              quantity = self.buy_quantity.get())))
             self.buy_button[i].grid(column = col * 4,
                                     row = row,
                                     columnspan = 4,
                                     )
-    def update_buy_buttons(self, value = 0):
+        self.buy_buttons = BuyButtons(self.engine, self.buy_button, color['deepblue'])
+        if len(self.generators) > slots:
+            self.make_scrollbar(parent, rows = per_column)
+        self.update_buy_buttons()
+
+    def make_scrollbar(self, parent, rows):
+        self.scrollbar = tk.Scrollbar(parent, orient = tk.VERTICAL, command = self.scroll_buy_buttons,
+                                      bg = color['deepgrey'], troughcolor = color['nearblack'])
+        self.scrollbar.grid(column = 8, row = 2, rowspan = rows, sticky = tk.NS)
+        parent.bind_all('<MouseWheel>', lambda e: self.scroll_buy_buttons('scroll', -1 if e.delta > 0 else 1, 'units'))
+        parent.bind_all('<Button-4>', lambda e: self.scroll_buy_buttons('scroll', -1, 'units'))
+        parent.bind_all('<Button-5>', lambda e: self.scroll_buy_buttons('scroll', 1, 'units'))
+        self.set_scrollbar()
+
+    def scroll_buy_buttons(self, action, amount, unit = 'units'):
+        """ tk.Scrollbar command: ('moveto', fraction) or ('scroll', n, 'units' or 'pages'). """
+        b = self.buy_buttons
+        if action == 'moveto':
+            first = float(amount) * len(self.generators)
+        elif unit == 'pages':
+            first = b.first + int(amount) * len(b.buttons)
+        else:
+            first = b.first + int(amount)
+        if b.scroll_to(first):
+            self.set_scrollbar()
+            self.update_buy_buttons()
+
+    def set_scrollbar(self):
+        n = len(self.generators)
+        first = self.buy_buttons.first
+        self.scrollbar.set(first / n, (first + len(self.buy_button)) / n)
 
+    def update_buy_buttons(self, value = 0):
+        """ Redraw the buy buttons; only the ones that changed get touched. """
         if value == 0:
             value = self.buy_quantity.get()
-        for b, g in zip(self.buy_button,self.generators):
-            exp = g.growth
-            x = g.name
-            m = g.max_buyable(self.total.widgets)
-
-            # We want to show the cost (c) of the number of items (value) the
-            # user has selected to buy. If user has selected max (value == 1000),
-            # and the max buyable (m) is 0, we should display the cost of 1 item.
-            c = round(g.bulk_cost(value if value != 1000 else (m if m > 0 else 1)),0) 
-            if g == self.generators[0]:
-                b["text"] = f"+{g.name}\n({g.owned})"
-            else:
-                b["text"] = f"+{x} ({c:,.6G}) (^{exp})\n({g.owned}, +{round(g.rate * self.total.prestige,2):,.6G}/s) (+{m})"
-            
-            if (m >= value or (value == 1000 and m >= 1) or g == self.generators[0]) and value:
-                b["bg"] = 'darkgreen'
-            else:
-                b["bg"] = color['deepblue']
+        return self.buy_buttons.refresh(value)
  
 
     def make_status_label(self,parent):
@@ -334,16 +308,32 @@ class Clicker(tk.Frame):
                         row = 0,
                         columnspan = 4,
                         )
-# !!!!  # initial call into the self.update() cycle
-        self.status.after(1000, self.update)
+
+        # achievements so far, and the latest (see achievements.py)
+        self.achievement = tk.Label(parent,
+                                    textvariable = self.achievement_label,
+                                    font = labelfont,
+                                    fg = color['brightgreen'],
+                                    width = 24,
+                                    relief = tk.RIDGE,
+                                    justify = tk.LEFT,
+                                    anchor = tk.W,
+                                    height = 3,
+                                    padx = 4,
+                                    bg = color['statusbg']
+                                    )
+        self.achievement.grid(column = 4,
+                              row = 0,
+                              columnspan = 4,
+                              )
 
     
     def make_quantity_buttons(self,parent):
         cols, rows = parent.grid_size()
         qframe = tk.Frame(parent, bg = color['deepgrey'])
         qframe.grid(in_ = parent, column = 0, row = 1, columnspan = cols)
-        for i, x in enumerate([1, 10, 25, 100, 1000]):
-            if x == 1000:
+        for i, x in enumerate([1, 10, 25, 100, BUY_MAX]):
+            if x == BUY_MAX:
                 txt = 'max'
                 val = x
             else:
@@ -364,14 +354,34 @@ class Clicker(tk.Frame):
                                             bd = 2,
                                             justify = tk.CENTER,
                                             disabledforeground = 'grey',
-                                            command = lambda x = x: self.update_buy_buttons(val),
+                                            command = lambda x = x: self.update_buy_buttons(x),
                                             ))
             self.buy_quantity_selection[i].grid(column = 0 + i,
                                             row = 1,
                                             )
+        tk.Button(qframe,
+                  text = 'graph',
+                  fg = color['brightgreen'],
+                  bg = color['deepgrey'],
+                  activebackground = 'green',
+                  width = 4,
+                  bd = 2,
+                  command = self.toggle_graph,
+                  ).grid(column = 5, row = 1, padx = (10, 0))
+        tk.Checkbutton(qframe,
+                       text = 'auto',
+                       fg = color['brightgreen'],
+                       bg = color['deepgrey'],
+                       activebackground = 'green',
+                       selectcolor = color['deepgrey'],
+                       variable = self.auto_buy,
+                       width = 4,
+                       ).grid(column = 6, row = 1)
+        self.master.bind('<F11>', self.toggle_graph)
 
     def get_reset_button_text(self):
-        return f'Leverage Investment and Restart (x{self.new_prestige()})\nLifetime Widgets: {int(self.total.ltwidgets):,}'
+        return f'Leverage Investment and Restart (x{self.new_prestige()})\nLifetime Widgets: {bignum.floor(self.total.ltwidgets):,}' \
+               f'\n{self.planner.text()}'
     
     def make_reset_button(self, parent):
         self.reset_text = tk.StringVar(value = self.get_reset_button_text())
@@ -394,19 +404,10 @@ class Clicker(tk.Frame):
                 quityn.grid_forget()
                 return -1
             
-            # Let's cancel the next update, so we don't get interrupted
-            self.status.after_cancel(self.updateid)
-            for g in self.generators:
-                g.reset(random.choice([1.07, 1.075, 1.08, 1.085, 1.09]))
-                
-            self.total.widgets = 0
-            self.total.rate = 0
-            self.total.prestige = self.new_prestige()
-            app.master.title(f"PyClicker IDLE game. (x{self.total.prestige})")
+            self.engine.prestige()
+            self.master.title(f"PyClicker IDLE game. (x{self.total.prestige})")
             quityn.grid_forget()
-            
-            # back to work
-            self.statusid = self.status.after(100,self.update)
+            self.update()
             return None
 
         quityn = tk.LabelFrame(self.master,
@@ -432,6 +433,16 @@ class Clicker(tk.Frame):
                           command = lambda : do_reset(reset = False),
                           )
         
+        plan = self.planner.plan()
+        if plan is not None and not plan.now and plan.per_hour > 0:
+            advice = tk.Label(quityn,
+                              text = f"Waiting {duration(plan.wait)} would give x{plan.bonus:,.2f}\n"
+                                     f"(+{plan.per_hour:,.3g}/h against +{plan.now_per_hour:,.3g}/h now)",
+                              bg = color['default'],
+                              fg = color['resetbuttontext'],
+                              )
+            advice.grid(column = 0, row = 1, columnspan = 2)
+
         quityn.grid(column = 5, row = 0, columnspan = 4)
         yesbtn.grid(column = 0, row = 0)
         nobtn.grid(column = 1, row = 0)
@@ -454,7 +465,11 @@ class Clicker(tk.Frame):
                       fg = 'lightgrey',
                       font = idlefont)
         iframe.grid(column = 0, row = 0)
-        tk.Label(iframe, text = f'{int(self.total.idle_widgets):,} widgets created!',
+        text = f'{bignum.floor(self.total.idle_widgets):,} widgets created!'
+        if self.engine.idle_purchases:
+            bought = self.engine.idle_purchases
+            text += f'\n{bought:,} purchase{"s" if bought != 1 else ""} made'
+        tk.Label(iframe, text = text,
                  font = idlefont,
                  bg = 'lightyellow', 
                  fg = 'black',
@@ -466,37 +481,85 @@ class Clicker(tk.Frame):
         
 
     def create_widgets(self):
-        """We create the individual widgets here."""
+        """We create the individual widgets here (the status label is already up)."""
         top = self.winfo_toplevel()
-        top.config(bg = color['deepgrey'], padx = 20, pady = 20)
-        self.make_status_label(top)
         #self.make_quit_button(top)
         self.make_buybuttons(top)
         self.make_quantity_buttons(top)
         self.make_reset_button(top)
+        self.status_label.set(self.get_status_text())
+        self.startup.mark('widgets built')
         if self.total.idle_widgets:
-            self.idle_popup(top)
-
-        
-    def buy(self, item , quantity = 1):
-        
-        g = item   #self.generators[items.index(item)]
-        tw = self.total.widgets
-        
-        if quantity == 1000 and g != self.generators[0]:
-            quantity = g.max_buyable(self.total.widgets)
-        elif g == self.generators[0]:
-            quantity = 1
-        bulk = g.bulk_cost(quantity)
+            self.after_idle(self.idle_popup, top)
+
+        # start the game loop
+        self.scheduler = Scheduler(self.status, simulate = self.update_totals, render = self.update,
+                                   step = sim_step, fps = frame_rate, profiler = self.profiler)
+        self.scheduler.start()
+        self.after_idle(self.startup.mark, 'ready')
+
+    def debug_overlay(self):
+        """ A small window with the profiler's numbers, refreshed every second. F12 toggles it. """
+        overlay = tk.Toplevel(self.master, bg = color['deepgrey'])
+        overlay.title('pyClicker profile')
+        text = tk.StringVar(value = self.profiler.text())
+        tk.Label(overlay, textvariable = text, font = ('Courier', 9), justify = tk.LEFT,
+                 fg = color['labeltext'], bg = color['deepgrey'], padx = 8, pady = 8).grid()
+
+        def refresh():
+            text.set(self.profiler.text())
+            overlay.refreshid = overlay.after(1000, refresh)
+
+        def toggle(event = None):
+            if overlay.state() == 'withdrawn':
+                overlay.deiconify()
+            else:
+                overlay.withdraw()
+
+        refresh()
+        self.master.bind('<F12>', toggle)
+        return overlay
+
+    def toggle_graph(self, event = None):
+        """ Show or hide the production graph (made the first time it's asked for). """
+        if self.graph is None:
+            self.make_graph()
+        elif self.graph_window.state() == 'withdrawn':
+            self.graph_window.deiconify()
+            self.graph.refresh()
+        else:
+            self.graph_window.withdraw()
+
+    def make_graph(self):
+        """ A window plotting the total rate from the engine's History, at one of its
+        resolutions. Only new points are drawn each frame (see render.HistoryGraph). """
+        window = tk.Toplevel(self.master, bg = color['deepgrey'], padx = 8, pady = 8)
+        window.title('pyClicker production')
+        window.protocol("WM_DELETE_WINDOW", window.withdraw)
+        canvas = tk.Canvas(window, width = 480, height = 160, bg = color['nearblack'], highlightthickness = 0)
+        canvas.grid(column = 0, row = 0, columnspan = 4)
+        self.graph = HistoryGraph(canvas, self.engine.history, self.engine.bank.names,
+                                  colour = color['brightgreen'])
+        self.graph_window = window
+        self.graph_caption = tk.StringVar(value = self.graph.caption())
+        tk.Label(window, textvariable = self.graph_caption, fg = color['labeltext'], bg = color['deepgrey'],
+                 anchor = tk.W).grid(column = 0, row = 1, columnspan = 4, sticky = tk.W)
+        level = tk.IntVar(value = self.graph.level)
+        for i, txt in enumerate(['sec', 'min', 'hour', 'day']):
+            tk.Radiobutton(window,
+                           text = txt,
+                           fg = color['brightgreen'],
+                           bg = color['deepgrey'],
+                           selectcolor = color['deepgrey'],
+                           variable = level,
+                           value = i,
+                           width = 4,
+                           command = lambda i = i: self.graph.set_level(i),
+                           ).grid(column = i, row = 2)
+        return window
         
-        if g == self.generators[0]:
-            g.owned += quantity
-            self.total.widgets += quantity
-            self.total.ltwidgets += quantity
-        elif (bulk <= tw and tw > 0):
-            g.owned += quantity
-            self.total.widgets -= bulk
-            self.total.spent += bulk
+    def buy(self, index, quantity = 1):
+        self.engine.buy(index, quantity)
         self.update_buy_buttons()
         self.status_label.set(self.get_status_text())
 
@@ -504,31 +567,74 @@ class Clicker(tk.Frame):
 
     
     def save_progress(self, overwrite = True):
-        savefile = 'clickersave.pkl'
-        with open(savefile,'wb') as f:
-            pickle.dump(self.generators,f)
-            pickle.dump((self.total),f)
-            pickle.dump(time.time(), f)
-        f.close()
+        self.engine.save()
     
     def load_save(self):
-        try:
-            with open(savefile,'rb') as f:
-                self.generators = pickle.load(f)
-                self.total = pickle.load(f)
-                savetime = pickle.load(f)
-        except:
-            #print("Ooops no save found")
-            return False
-
-        self.total.idle_widgets = round( (time.time() - savetime) * self.total.rate,2)
-        self.total.ltwidgets += self.total.idle_widgets
-        self.total.widgets += self.total.idle_widgets
-        return True
-
-
-
-root = tk.Tk()
-app = Clicker(master=root)
-app.master.title(f"PyClicker IDLE game. (x{app.total.prestige})")
-app.mainloop()
+        """ Take the game load_in_background() read. When it couldn't be loaded, that's
+        reported, the save is moved aside and False returned, as it is when there was no save. """
+        e = self.load_error
+        if e is None:
+            self.engine = self.loaded
+            return True
+        from tkinter import messagebox
+        if isinstance(e, saves.SaveError):
+            path, reason = e.path, str(e)
+        else:
+            # not a damaged save as such, but playing on would save over it
+            path, reason = engine.savefile, f'{type(e).__name__}: {e}'
+        message = f"Your save couldn't be loaded, so a new game was started.\n({reason})"
+        if path is not None and os.path.isfile(path):
+            # keep it for inspection rather than saving over it
+            aside = f'{path}.damaged'
+            try:
+                os.replace(path, aside)
+                message += f"\nThe old file was kept as {aside}"
+            except OSError as error:
+                message += f"\nThe old file couldn't be moved aside ({error})"
+        messagebox.showwarning("Save not loaded", message)
+        return False
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'pyClicker IDLE game')
+    parser.add_argument('--profile', metavar = 'FILE',
+                        help = 'time the game loop and write the numbers to FILE (JSON) on exit')
+    parser.add_argument('--overlay', action = 'store_true',
+                        help = 'time the game loop and show the numbers in a window (F12 toggles it)')
+    parser.add_argument('--catalog', metavar = 'FILE',
+                        help = 'play with the items in FILE (JSON, or a compiled .npy) for a new game')
+    parser.add_argument('--journal', metavar = 'FILE',
+                        help = 'record the session to FILE, for journal.py to replay')
+    parser.add_argument('--seed', type = int,
+                        help = 'seed the growth rolls (a new game\'s, and the journal\'s)')
+    parser.add_argument('--startup-time', metavar = 'FILE', nargs = '?', const = '',
+                        help = 'time startup (to the first frame, the save loaded and the window '
+                               'ready), print it and quit without saving; also written to FILE (JSON)')
+    args = parser.parse_args()
+    try:
+        catalog = Catalog.load(args.catalog) if args.catalog else None
+    except (OSError, CatalogError) as e:
+        parser.error(str(e))
+
+    root = tk.Tk()
+    root.title("PyClicker IDLE game.")      # the prestige is added once the save is loaded
+    timer = StartupTimer(started)
+    app = Clicker(master=root, profiler = Profiler(enabled = bool(args.profile or args.overlay)), catalog = catalog,
+                  journal = Journal(args.journal, seed = args.seed) if args.journal else None, seed = args.seed,
+                  startup = timer)
+    if args.overlay:
+        app.debug_overlay()
+    if args.startup_time is not None:
+        def report():
+            if 'ready' not in timer.marks:
+                app.after(load_poll, report)
+                return None
+            print(timer.text())
+            if args.startup_time:
+                timer.dump(args.startup_time, items = len(app.engine.bank),
+                           save_bytes = os.path.getsize(engine.savefile) if os.path.exists(engine.savefile) else 0)
+            root.destroy()
+            return None
+        app.after(load_poll, report)
+    app.mainloop()
+    if args.profile:
+        app.profiler.dump(args.profile)
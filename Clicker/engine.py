@@ -0,0 +1,524 @@
+# pyClicker IDLE game - simulation core
+# Everything in here runs without tkinter, so the economy can be imported,
+# stepped and tested from scripts with no display.
+import time
+import random
+import pickle
+import os
+
+import bignum
+from achievements import Achievements, default_rules, owned, RATE, LTWIDGETS
+from bank import GeneratorBank
+from catalog import Catalog, default_growth
+from fastforward import fast_forward
+from history import History
+import saves
+
+savefile = 'clickersave.dat'
+# where saves were pickled before saves.py; still read if there's no new save
+legacy_savefile = 'clickersave.pkl'
+
+# The growth rolls used for a new game and for each generator on reset, in the stock catalog.
+growth_choices = list(default_growth)
+
+# buy() quantity which means "as many as I can afford"
+BUY_MAX = 1000
+
+class Generator():
+    """ Generator() class for clicker game items.
+        A Generator is a view onto one row of a GeneratorBank, which holds the numbers for
+        every generator in a game as arrays. Made on its own, a Generator gets a private
+        one-row bank, so it still works standalone.
+
+        >>> items = ['Click', 'Pencil', 'Pen, 'Stick']
+
+        >>> costs = [ (4 * (11 ** x) ) for x in range( len(items) ) ]
+
+        >>> costs.insert(0,0)
+
+        >>> rates = [ (2.5 * (8 ** x) ) for x in range( len(items) ) ]
+
+        >>> rates.insert(0,0)
+
+        >>> bank = GeneratorBank(items, cost_base = costs, rate_base = rates, \
+                                 growth = random.choice([1.07, 1.075, 1.08, 1.085, 1.09]))
+
+        >>> generators = [Generator.view(bank, i) for i in range(len(bank))]
+
+                    """
+
+    __slots__ = ('_bank', '_i')
+
+    def __init__(self, name = '', cost_base = 1, rate_base = 1, growth = 1.07, widgets = 0, \
+                 lifetime_widgets = 0, owned = 0 ):
+        """ Standalone generator. multiplier and rate are derived from owned.
+        Should specify at least name, cost_base and rate_base to start. """
+        self._bank = GeneratorBank([name], cost_base = cost_base, rate_base = rate_base, growth = growth,
+                                   owned = owned, widgets = widgets, lifetime_widgets = lifetime_widgets)
+        self._i = 0
+        return None
+
+    @classmethod
+    def view(cls, bank, index):
+        """ A Generator reading and writing row index of bank. """
+        g = cls.__new__(cls)
+        g._bank = bank
+        g._i = index
+        return g
+
+    @property
+    def name(self):
+        return self._bank.names[self._i]
+
+    @name.setter
+    def name(self, name):
+        self._bank.names[self._i] = name
+
+    @property
+    def cost_base(self):
+        return float(self._bank.cost_base[self._i])
+
+    @cost_base.setter
+    def cost_base(self, x):
+        self._bank.set_cost_base(self._i, x)
+
+    @property
+    def rate_base(self):
+        return float(self._bank.rate_base[self._i])
+
+    @rate_base.setter
+    def rate_base(self, x):
+        self._bank.rate_base[self._i] = x
+        self._bank.recompute_rates(self._i)
+
+    @property
+    def growth(self):
+        return float(self._bank.growth[self._i])
+
+    @growth.setter
+    def growth(self, x):
+        self._bank.set_growth(self._i, x)
+
+    @property
+    def multiplier(self):
+        return float(self._bank.multiplier[self._i])
+
+    @property
+    def rate(self):
+        return float(self._bank.rate[self._i])
+
+    @property
+    def every(self):
+        return int(self._bank.every[self._i])
+
+    @property
+    def factor(self):
+        return float(self._bank.factor[self._i])
+
+    @property
+    def lifetime_widgets(self):
+        return float(self._bank.lifetime_widgets[self._i])
+
+    @lifetime_widgets.setter
+    def lifetime_widgets(self, x):
+        self._bank.lifetime_widgets[self._i] = x
+
+    @property
+    def widgets(self):
+        return float(self._bank.widgets[self._i])
+
+    @widgets.setter
+    def widgets(self, quantity = 0):
+        """ This .setter assumes that if self.widgets is being set, it's either incrementing
+        by production, or being reset to 0. Any increase is added to lifetime_widgets too. """
+        if quantity > 0:
+            made = quantity - self._bank.widgets[self._i]
+            if made > 0:
+                self._bank.lifetime_widgets[self._i] += made
+            self._bank.widgets[self._i] = quantity
+        elif quantity == 0:
+            self._bank.widgets[self._i] = 0
+
+    def reset(self, growth = 1.07, widgets = 0, owned = 0):
+        """ Helper to reset appropriate values to start over."""
+        self.growth = growth
+        self.widgets = widgets
+        self.owned = owned
+        return None
+
+    def bulk_cost(self, quantity = 1):
+        """ Returns the cost of quantity items. Exponential growth on cost.
+        Past float range the cost comes back as a bignum.Big. The x1/x10/x25/x100
+        costs are cached on the bank until owned or growth changes. """
+        return self._bank.price(self._i, quantity)
+
+    def max_buyable(self, amount = 0):
+        """returns the maximum widgets which can be bought with amount.
+        (usually some total of widgets available, a float or a bignum.Big)"""
+        return self._bank.max_buyable_one(self._i, amount)
+
+    @property
+    def owned(self):
+        return int(self._bank.owned[self._i])
+
+    @owned.setter
+    def owned(self,x):
+        """ sets the self.owned property and updates self.multipler and self.rate.
+        self.multiplier goes up by the milestone factor for every `every` owned
+        (doubles for every 25, in the stock catalog)."""
+        self._bank.set_owned(self._i, x)
+        return None
+
+    def __reduce__(self):
+        # pickled as a standalone Generator, so a save doesn't drag the whole bank along
+        return (Generator, (self.name, self.cost_base, self.rate_base, self.growth, self.widgets,
+                            self.lifetime_widgets, self.owned))
+
+    def __setstate__(self, state):
+        """ Saves from before the bank pickled the Generator's __dict__. """
+        if isinstance(state, tuple):
+            state = state[0] or {}
+        self.__init__(name = state.get('name', ''),
+                      cost_base = state.get('cost_base', 1),
+                      rate_base = state.get('rate_base', 1),
+                      growth = state.get('growth', 1.07),
+                      widgets = state.get('_widgets', 0),
+                      lifetime_widgets = state.get('lifetime_widgets', 0),
+                      owned = state.get('_owned', 0))
+
+    def __str__(self):
+        return f'Name: {self.name},\n  - growth:{self.growth},\n' \
+               f'  - owned:{self.owned},\n' \
+               f'  - multiplier:{self.multiplier},\n  - rate:{self.rate},\n' \
+               f'  - widgets:{self.widgets}\n' \
+               f'  - l/t widgets:{self.lifetime_widgets},\n  - cost base:{self.cost_base},\n' \
+               f'  - rate base:{self.rate_base}'
+    def __repr__(self):
+        return f'Generator(name = {self.name}, cost_base = {self.cost_base}, rate_base = {self.rate_base}, ' \
+               f'growth = {self.growth}, widgets = {self.widgets}, ' \
+               f'lifetime_widgets = {self.lifetime_widgets}, owned = {self.owned})'
+
+
+# ################################
+# Balancing with these numbers:
+#  - cost_growth: The factor by which each level of item is more expensive than the previous item
+#  - rate_growth: the factor by which each rate of production is greater than the previous items's rate
+#  - cost_base: the cost of the least expensive item
+#  - rate_base: the production rate of starting item
+#
+# add new items by simply expanding this list.
+items = ['Click', 'Pencil',
+         'Pen', 'Tape',
+         'Stapler', 'Ruler',
+         'Square', 'Divider',
+         'Knife', 'Slide Rule',
+         'Hammer', 'Screwdriver',
+         'Caliper', 'Clamp',
+         'Drill', 'Nailgun',
+         'Grinder', 'Drill Press' ]
+cost_growth = 18.2
+cost_base = 11.8
+rate_growth = 4.88
+rate_base = 3.57
+costs = [ (cost_base * (cost_growth ** x) ) for x in range( len(items) ) ]
+costs.insert(0,0)
+rates = [ (rate_base * (rate_growth ** x) ) for x in range( len(items) ) ]
+rates.insert(0,0)
+
+# Games are played with a catalog.Catalog; this is the one built from the numbers above.
+# Others can be loaded from data files with Catalog.load().
+stock_catalog = Catalog.from_items(items, costs[:len(items)], rates[:len(items)], growth_choices)
+
+################################
+
+class Total():
+    # widgets, rate, ltwidgets and friends are floats, until they outgrow float range
+    # and become bignum.Big. Use bignum.add/mul when adding to them.
+
+    def __init__(self):
+        self.widgets = 0
+        self.rate = 0
+        self.idle_widgets = 0
+        self.prestige = 1
+        self.spent = 0
+        self.ltwidgets = 0
+        return None
+
+
+class Engine():
+    """ Headless clicker game: a list of Generators plus the running Total.
+        The tkinter Clicker frame is only a view over one of these.
+
+        >>> game = Engine()
+
+        >>> game.buy(1)          # one Pencil, if you can afford it
+
+        >>> game.tick(3600)      # an hour of production
+
+        >>> game.prestige()      # restart with a new bonus
+    """
+
+    def __init__(self, generators = None, total = None, rng = random, catalog = None):
+        """ generators can be a GeneratorBank or a list of Generators (e.g. from an old save).
+        With no generators, a new game is started from catalog (stock_catalog by default)
+        with a single growth roll for every generator. The catalog's growth rolls are used
+        again on reset; if it doesn't match the generators (a save made with other items)
+        they keep their own numbers and get the stock rolls. """
+        self.rng = rng
+        self.total = total if total is not None else Total()
+        if generators is None:
+            catalog = catalog if catalog is not None else stock_catalog
+            generators = catalog.bank(self.rng)
+        elif not isinstance(generators, GeneratorBank):
+            generators = GeneratorBank.from_generators(generators)
+        if catalog is None or len(catalog) != len(generators):
+            catalog = stock_catalog if generators.names == stock_catalog.names else Catalog.from_bank(generators)
+        self.catalog = catalog
+        self.bank = generators
+        self.generators = [Generator.view(self.bank, i) for i in range(len(self.bank))]
+        self.achievements = Achievements(default_rules(self.bank.names), self.bank.names)
+        self.history = None         # a History, to have production recorded (see history.py)
+        self.idle_purchases = 0     # what the last credit_idle() bought (not saved)
+        self.run_started = time.time()      # when the generators were last started over
+        return None
+
+    def tick(self, dt = 1.0):
+        """ Run production for dt seconds. Returns the widgets made. """
+        tw = self.bank.tick(self.total.prestige, dt)
+        made = bignum.mul(tw, dt)
+        self.total.rate = tw
+        self.total.widgets = bignum.add(self.total.widgets, made)
+        self.total.ltwidgets = bignum.add(self.total.ltwidgets, made)
+        self.achievements.update(RATE, tw)
+        self.achievements.update(LTWIDGETS, self.total.ltwidgets)
+        if self.history is not None:
+            self.history.record(dt, tw, self.bank.rate)
+        return made
+
+    def cost(self, index, quantity = 1):
+        """ What buy(index, quantity) would charge, with BUY_MAX resolved to the
+        max buyable (or 1 when nothing is affordable, which is what the buttons show). """
+        g = self.generators[index]
+        if quantity == BUY_MAX:
+            m = g.max_buyable(self.total.widgets)
+            quantity = m if m > 0 else 1
+        return g.bulk_cost(quantity)
+
+    def buy(self, index, quantity = 1):
+        """ Buy quantity of generators[index], or as many as affordable with BUY_MAX.
+        Generator 0 is the free Click, which makes a widget per purchase.
+        Returns the number bought (0 if it couldn't be afforded). """
+        g = self.generators[index]
+        tw = self.total.widgets
+
+        if index == 0:
+            g.owned += 1
+            self.total.widgets += 1
+            self.total.ltwidgets += 1
+            self.achievements.update(owned(0), g.owned)
+            self.achievements.update(LTWIDGETS, self.total.ltwidgets)
+            return 1
+
+        if quantity == BUY_MAX:
+            quantity = g.max_buyable(tw)
+        if quantity <= 0:
+            return 0
+        bulk = g.bulk_cost(quantity)
+
+        if (bulk <= tw and tw > 0):
+            g.owned += quantity
+            self.total.widgets -= bulk
+            self.total.spent = bignum.add(self.total.spent, bulk)
+            self.achievements.update(owned(index), g.owned)
+            return quantity
+        return 0
+
+    def new_prestige(self):
+        """ The prestige multiplier a restart would give right now. """
+        tl = self.total.ltwidgets
+        if tl <= 1000:
+            return 1
+        try:
+            xx = max(150 * (bignum.sqrt(tl / 1.0E+14)),1.0)
+        except (ValueError, OverflowError):
+            return max(self.total.prestige,1)
+        return round(xx,2)
+
+    def reset(self):
+        """ Start the generators over with fresh growth rolls. Lifetime widgets and the
+        prestige multiplier are kept. """
+        self.bank.reset(self.catalog.roll_growth(self.rng))
+
+        self.total.widgets = 0
+        self.total.rate = 0
+        self.achievements.restart()
+        self.run_started = time.time()
+        return None
+
+    def check_achievements(self):
+        """ Look at every metric, e.g. after loading. Returns what that unlocked. """
+        unlocked = self.achievements.update(RATE, self.total.rate)
+        unlocked += self.achievements.update(LTWIDGETS, self.total.ltwidgets)
+        unlocked += self.achievements.update_owned(self.bank.owned)
+        return unlocked
+
+    def prestige(self):
+        """ Reset and take the new prestige multiplier. Returns the multiplier. """
+        bonus = self.new_prestige()
+        self.reset()
+        self.total.prestige = bonus
+        return bonus
+
+    def credit_idle(self, seconds, policy = None):
+        """ Credit production for time spent away. With a buy policy (see fastforward.py)
+        purchases are made along the way, as they become affordable; the count is kept
+        in idle_purchases. """
+        made, purchases = fast_forward(self, max(seconds, 0), policy)
+        self.total.idle_widgets = round(made,2)
+        self.idle_purchases = purchases
+        self.total.rate = self.bank.total_rate(self.total.prestige)
+        return self.total.idle_widgets
+
+    def snapshot(self):
+        """ A copy of the game state as plain data (see saves.py), safe to hand to another
+        thread while this one carries on playing. """
+        bank = self.bank
+        sections = {saves.MILESTONES: saves.pack_milestones(bank.every, bank.factor),
+                    saves.ACHIEVEMENTS: saves.pack_achievements(self.achievements.unlocked),
+                    saves.RUN: saves.pack_run(self.run_started)}
+        if self.history is not None:
+            sections[saves.HISTORY] = self.history.pack()
+        return {'savetime': time.time(),
+                'total': {f: getattr(self.total, f) for f in saves.total_fields},
+                'names': list(bank.names),
+                'cost_base': bank.cost_base.copy(),
+                'rate_base': bank.rate_base.copy(),
+                'growth': bank.growth.copy(),
+                'widgets': bank.widgets.copy(),
+                'lifetime_widgets': bank.lifetime_widgets.copy(),
+                'owned': bank.owned.copy(),
+                'sections': sections,
+                }
+
+    def copy(self):
+        """ The economy alone, to run forward without touching this game: the generators,
+        totals, milestones and run start. No history, and achievements start empty without
+        being looked at (see from_snapshot for a full copy). """
+        bank = self.bank
+        copy = GeneratorBank(bank.names,
+                             cost_base = bank.cost_base,
+                             rate_base = bank.rate_base,
+                             growth = bank.growth,
+                             owned = bank.owned,
+                             widgets = bank.widgets,
+                             lifetime_widgets = bank.lifetime_widgets,
+                             every = bank.every,
+                             factor = bank.factor)
+        total = Total()
+        for f in saves.total_fields:
+            setattr(total, f, getattr(self.total, f))
+        game = type(self)(copy, total, rng = self.rng, catalog = self.catalog)
+        game.run_started = self.run_started
+        return game
+
+    @classmethod
+    def from_snapshot(cls, snapshot, rng = random, catalog = None):
+        every, factor = 25, 2.0
+        milestones = snapshot.get('sections', {}).get(saves.MILESTONES)
+        if milestones is not None:
+            every, factor = saves.unpack_milestones(milestones, len(snapshot['names']))
+        bank = GeneratorBank(snapshot['names'],
+                             cost_base = snapshot['cost_base'],
+                             rate_base = snapshot['rate_base'],
+                             growth = snapshot['growth'],
+                             owned = snapshot['owned'],
+                             widgets = snapshot['widgets'],
+                             lifetime_widgets = snapshot['lifetime_widgets'],
+                             every = every,
+                             factor = factor)
+        total = Total()
+        for f, x in snapshot['total'].items():
+            setattr(total, f, x)
+        game = cls(bank, total, rng = rng, catalog = catalog)
+        unlocked = snapshot.get('sections', {}).get(saves.ACHIEVEMENTS)
+        if unlocked is not None:
+            game.achievements.unlocked.update(saves.unpack_achievements(unlocked))
+        # anything already reached (e.g. in a save from before achievements) unlocks now
+        game.check_achievements()
+        run = snapshot.get('sections', {}).get(saves.RUN)
+        if run is not None:
+            game.run_started = saves.unpack_run(run)
+        history = snapshot.get('sections', {}).get(saves.HISTORY)
+        if history is not None:
+            try:
+                game.history = History.unpack(history, len(bank))
+            except ValueError:
+                pass                # only statistics: start them over rather than lose the save
+        return game
+
+    def save(self, path = None):
+        saves.write(path or savefile, self.snapshot())
+        return None
+
+    @classmethod
+    def load(cls, path = None, rng = random, policy = None, catalog = None):
+        """ Load a save and credit the time since it was written, buying with policy while
+        away if one is given. Returns None when there's no save. A file that can't be read
+        raises saves.SaveError.
+        With no path, an old pickle save (legacy_savefile) is picked up if there's no new
+        one; the next save() writes it out in the new format.
+        catalog is the one the game is played with, for growth rolls on reset. """
+        if path is None:
+            path = savefile if os.path.exists(savefile) or not os.path.exists(legacy_savefile) \
+                   else legacy_savefile
+        try:
+            snapshot = saves.read(path)
+        except FileNotFoundError:
+            return None
+        except saves.NotASave:
+            snapshot = _read_pickle_save(path)
+
+        try:
+            game = cls.from_snapshot(snapshot, rng = rng, catalog = catalog)
+        except saves.SaveError as e:
+            # the section unpackers don't know which file they were reading
+            e.path = path
+            raise
+        game.credit_idle(time.time() - snapshot['savetime'], policy)
+        return game
+
+
+def _read_pickle_save(path):
+    """ Snapshot from a save written by pickling the generators, Total and save time. """
+    try:
+        with open(path,'rb') as f:
+            # one unpickler per dump(), each dump has its own memo
+            generators = _LegacyUnpickler(f).load()
+            total = _LegacyUnpickler(f).load()
+            savetime = _LegacyUnpickler(f).load()
+        game = Engine(generators, total)
+        snapshot = game.snapshot()
+        defaults = Total()
+        snapshot['total'] = {f: getattr(total, f, getattr(defaults, f)) for f in saves.total_fields}
+        snapshot['savetime'] = float(savetime)
+    except (EOFError, pickle.UnpicklingError, AttributeError, TypeError, ValueError) as e:
+        error = saves.SaveError(f'{path} is not a save we can read ({e})')
+        error.path = path
+        raise error from e
+    return snapshot
+
+
+class _LegacyUnpickler(pickle.Unpickler):
+    """ Loads old pickle saves, refusing anything but the game's own classes.
+    Saves written before the engine was split out of clicker.py refer to
+    __main__.Generator and __main__.Total. Point those here. """
+
+    allowed = {('engine', 'Generator'), ('engine', 'Total'), ('bignum', 'Big'),
+               ('copyreg', '_reconstructor'), ('builtins', 'object')}
+
+    def find_class(self, module, name):
+        if module == '__main__' and name in ('Generator', 'Total'):
+            module = 'engine'
+        if (module, name) not in self.allowed:
+            raise pickle.UnpicklingError(f'{module}.{name} is not allowed in a save')
+        return super().find_class(module, name)
@@ -0,0 +1,89 @@
+# pyClicker IDLE game - offline progress
+# Instead of stepping the game second by second, jump straight from one
+# purchase to the next: with a fixed rate, the time until a cost is
+# affordable is just (cost - widgets) / rate.
+import math
+
+import numpy as np
+
+import bignum
+
+def cheapest(engine):
+    """ Buy policy: the cheapest single generator (the free Click is skipped). """
+    bank = engine.bank
+    cost = bank.ln_bulk_cost(1)
+    cost[bank.cost_base <= 0] = np.inf
+    i = int(np.argmin(cost))
+    if not np.isfinite(cost[i]):
+        return None
+    return (i, 1)
+
+def best_value(engine):
+    """ Buy policy: the single generator that adds the most rate per widget spent,
+    counting the milestone bonus (see GeneratorBank.ln_gain). """
+    bank = engine.bank
+    with np.errstate(invalid = 'ignore'):
+        value = bank.ln_gain() - bank.ln_bulk_cost(1)
+    value[(bank.cost_base <= 0) | np.isnan(value)] = -np.inf
+    i = int(np.argmax(value))
+    if value[i] == -np.inf:
+        return None
+    return (i, 1)
+
+def fast_forward(engine, seconds, policy = None, step = 1.0, on_buy = None):
+    """ Run engine for seconds, buying whatever policy(engine) asks for as soon as it
+    can be afforded. policy returns (index, quantity) or None to just save up.
+    on_buy(engine, elapsed, index, quantity) is called after each purchase.
+
+    Production only moves in whole steps (1 second, like the game loop), so the result
+    matches step_forward() with the same step; step = 0 buys at the exact instant instead.
+    Cost is one tick per purchase rather than one per step.
+    Returns (widgets made, number of purchases). """
+    left = seconds
+    made = 0
+    purchases = 0
+    while left > 0:
+        target = policy(engine) if policy else None
+        cost = None
+        if target is not None:
+            index, quantity = target
+            cost = engine.cost(index, quantity)
+            if cost <= engine.total.widgets:
+                bought = engine.buy(index, quantity)
+                if bought:
+                    purchases += 1
+                    if on_buy:
+                        on_buy(engine, seconds - left, index, bought)
+                    continue
+                cost = None
+
+        rate = engine.bank.total_rate(engine.total.prestige)
+        if cost is None or rate <= 0 or not bignum.isfinite(cost):
+            wait = left
+        else:
+            wait = (cost - engine.total.widgets) / rate
+            if wait >= left:
+                wait = left
+            elif step:
+                # at least one step, or rounding could leave us a hair short forever
+                wait = min(max(math.ceil(wait / step), 1) * step, left)
+        made += engine.tick(wait)
+        left -= wait
+    return made, purchases
+
+def step_forward(engine, seconds, policy = None, step = 1.0):
+    """ The slow reference for fast_forward(): tick every step and buy whatever is
+    affordable in between. """
+    left = seconds
+    made = 0
+    purchases = 0
+    while left > 0:
+        while policy:
+            target = policy(engine)
+            if target is None or not engine.buy(*target):
+                break
+            purchases += 1
+        wait = min(step, left)
+        made += engine.tick(wait)
+        left -= wait
+    return made, purchases
@@ -0,0 +1,211 @@
+# pyClicker IDLE game - production history
+# Keeps what the game produced over time at several resolutions at once:
+# every second for the last ten minutes, every minute for a day, every hour
+# for three months and every day for two years. Each resolution is a fixed
+# size ring, so the memory used is the same after a minute or a year.
+#
+# A sample is the average total rate over its period (stored as log10, so
+# numbers past float range fit) and each generator's share of it (as 16 bit
+# fractions). Time is game time: seconds the economy has been run for, which
+# includes time credited while the game was closed.
+import struct
+
+import numpy as np
+
+import bignum
+from bignum import Big
+
+# (seconds per sample, samples kept)
+default_levels = ((1, 600), (60, 24 * 60), (3600, 24 * 90), (86400, 730))
+
+# catalogs with more generators than this only have their total recorded
+per_generator_limit = 256
+
+_share_scale = 65535
+_head = struct.Struct('<dB')
+_level = struct.Struct('<dIIQdi')
+
+
+class Level():
+    """ One resolution: a ring of the last `capacity` samples, `step` seconds each, and
+    the sample being built. Sample j covers game time j * step to (j + 1) * step. """
+
+    def __init__(self, step, capacity, width):
+        self.step = step
+        self.capacity = capacity
+        self.count = 0                                          # samples finished so far
+        self.log_rate = np.full(capacity, -np.inf)
+        self.shares = np.zeros((capacity, width), dtype = np.uint16)
+        # the open sample: widgets made, and how the time was split between share vectors.
+        # Time at the latest shares is just counted (_held); the numpy work of mixing in
+        # another vector is only done when the rates change part way through a sample.
+        self._made = 0.0
+        self._current = None                                    # (shares, quantized) from History
+        self._held = 0.0
+        self._mix = np.zeros(width)                             # share * seconds, for the rest
+        self._mixed = False
+        return None
+
+    def add(self, now, dt, rate, shares):
+        """ dt seconds at rate (widgets/s) with shares (see History.record), starting at
+        game time now. """
+        left = dt
+        room = (self.count + 1) * self.step - now
+        if left < room:
+            self._accumulate(left, rate, shares)
+            return None
+        self._accumulate(max(room, 0), rate, shares)
+        self._close()
+        left -= max(room, 0)
+        n = int(left // self.step)
+        if n:
+            self._fill(n, rate, shares)
+            left -= n * self.step
+        if left > 0:
+            self._accumulate(left, rate, shares)
+        return None
+
+    def _accumulate(self, dx, rate, shares):
+        self._made = bignum.add(self._made, bignum.mul(rate, dx))
+        if shares is not self._current:
+            self._settle()
+            self._current = shares
+        self._held += dx
+        return None
+
+    def _settle(self):
+        """ Fold the time spent at the current shares into the mix. """
+        if self._held and self._current is not None:
+            self._mix += self._current[0] * self._held
+            self._mixed = True
+        self._held = 0.0
+        return None
+
+    def open_shares(self):
+        """ share * seconds so far in the open sample. """
+        if self._current is None:
+            return self._mix.copy()
+        return self._mix + self._current[0] * self._held
+
+    def _close(self):
+        slot = self.count % self.capacity
+        self.log_rate[slot] = bignum.log10(self._made / self.step)
+        if self._mixed:
+            self.shares[slot] = np.rint(self.open_shares() / self.step * _share_scale)
+            self._mix[:] = 0
+            self._mixed = False
+        elif self._current is not None:
+            self.shares[slot] = self._current[1]
+        self._made = 0.0
+        self._held = 0.0
+        self.count += 1
+        return None
+
+    def _fill(self, n, rate, shares):
+        """ n whole samples at a steady rate; only the last capacity of them are kept. """
+        k = min(n, self.capacity)
+        slots = (self.count + n - k + np.arange(k)) % self.capacity
+        self.log_rate[slots] = bignum.log10(rate)
+        if shares is not None:
+            self.shares[slots] = shares[1]
+        self.count += n
+        return None
+
+    def samples(self, since = 0):
+        """ (index, log10 rate, shares) of the samples kept, from index since on, oldest first.
+        shares are fractions of the total. """
+        first = max(since, self.count - self.capacity, 0)
+        j = np.arange(first, self.count)
+        slots = j % self.capacity
+        return j, self.log_rate[slots], self.shares[slots] / _share_scale
+
+
+class History():
+    """ Production history for a game with width generators.
+
+        >>> history = History(len(game.bank))
+
+        >>> history.record(1.0, game.total.rate, game.bank.rate)    # Engine.tick() does this
+
+        >>> j, log_rate, shares = history.levels[1].samples()        # per minute
+    """
+
+    def __init__(self, width, levels = default_levels):
+        self.width = width
+        self.now = 0.0          # game seconds recorded
+        tracked = width if width <= per_generator_limit else 0
+        self.levels = [Level(step, capacity, tracked) for step, capacity in levels]
+        self.tracked = tracked
+        self._rate = None           # the rate the shares below were worked out for
+        self._shares = None         # (fractions, as stored) or None when not tracked
+        return None
+
+    def record(self, dt, rate, rows):
+        """ dt seconds of production at rate (the game's total, prestige included), split
+        between the generators in proportion to rows (their own rates). The split is only
+        worked out again when rate changes, i.e. after a purchase or a reset. """
+        if self._rate is None or rate != self._rate:
+            self._rate = rate
+            self._shares = self._split(rows) if self.tracked else None
+        for level in self.levels:
+            level.add(self.now, dt, rate, self._shares)
+        self.now += dt
+        return None
+
+    def _split(self, rows):
+        with np.errstate(over = 'ignore', invalid = 'ignore'):
+            shares = rows / rows.sum()
+        if not np.isfinite(shares).all():
+            shares = np.nan_to_num(shares, nan = 0.0, posinf = 1.0)
+        return shares, np.rint(shares * _share_scale).astype(np.uint16)
+
+    def pack(self):
+        """ bytes for the save (see saves.py): the samples kept, not the empty slots. """
+        parts = [_head.pack(self.now, len(self.levels))]
+        for level in self.levels:
+            j, log_rate, shares = level.samples()
+            made = level._made
+            # like saves.py: plain floats with exponent 0, Big never has one
+            m, e = (made.m, made.e) if isinstance(made, Big) else (float(made), 0)
+            parts.append(_level.pack(level.step, level.capacity, self.tracked, level.count, m, e))
+            parts.append(level.open_shares().astype('<f8').tobytes())
+            parts.append(np.ascontiguousarray(log_rate, dtype = '<f8').tobytes())
+            parts.append(np.ascontiguousarray(level.shares[j % level.capacity], dtype = '<u2').tobytes())
+        return b''.join(parts)
+
+    @classmethod
+    def unpack(cls, data, width):
+        """ A History from pack()'s bytes. Raises ValueError if they don't fit a game with
+        width generators. """
+        try:
+            now, n = _head.unpack_from(data)
+            pos = _head.size
+            levels = []
+            for _ in range(n):
+                step, capacity, tracked, count, m, e = _level.unpack_from(data, pos)
+                pos += _level.size
+                levels.append((step, capacity, tracked, count, m, e, pos))
+                kept = min(count, capacity)
+                pos += 8 * tracked + 8 * kept + 2 * kept * tracked
+            if pos != len(data):
+                raise ValueError('history section has the wrong length')
+        except struct.error as e:
+            raise ValueError(f'history section is damaged ({e})') from e
+
+        history = cls(width, [(step, capacity) for step, capacity, *rest in levels])
+        history.now = now
+        for level, (step, capacity, tracked, count, m, e, pos) in zip(history.levels, levels):
+            if tracked != history.tracked:
+                raise ValueError(f'history is for {tracked} generators, not {history.tracked}')
+            kept = min(count, capacity)
+            level.count = count
+            level._made = Big(m, e) if e else m
+            level._mix[:] = np.frombuffer(data, dtype = '<f8', count = tracked, offset = pos)
+            level._mixed = True
+            pos += 8 * tracked
+            slots = np.arange(count - kept, count) % capacity
+            level.log_rate[slots] = np.frombuffer(data, dtype = '<f8', count = kept, offset = pos)
+            pos += 8 * kept
+            level.shares[slots] = np.frombuffer(data, dtype = '<u2', count = kept * tracked,
+                                                offset = pos).reshape(kept, tracked)
+        return history
@@ -0,0 +1,347 @@
+# pyClicker IDLE game - event journal and replay
+# A journal records everything done to an Engine: the random seed and the
+# starting state, then every tick, purchase and prestige in order. The
+# economy is deterministic given those, so replay() can redo a session
+# headlessly and check it ends in exactly the state the journal says it did.
+# That makes bug reports and balance changes reproducible.
+#
+#   python clicker.py --journal session.journal
+#   python journal.py session.journal          (replay it and compare)
+#
+# Layout (little endian): 'PYCJ' u16 version, then records of a u8 kind and its payload
+#   'S'  u64 seed, u32 length, starting state (saves.encode())
+#   'T'  f64 dt, u32 count                  count ticks of dt in a row
+#   'B'  u32 index, u64 quantity, u64 bought
+#   'P'  prestige                           'R'  reset
+#   'C'  u32 crc of the state (see digest())
+#   'E'  u32 length, final state (saves.encode())
+# Records are only ever appended; a journal cut short (a crash) still replays
+# up to where it stops.
+#
+# Replay does long runs of ticks in bulk: numpy's add.accumulate performs the
+# same float additions in the same order as tick() would, so the result is
+# identical to the last bit, just much faster.
+import argparse
+import os
+import random
+import struct
+import sys
+import time
+import zlib
+
+import numpy as np
+
+import bignum
+import saves
+from achievements import RATE, LTWIDGETS
+from engine import Engine
+
+MAGIC = b'PYCJ'
+VERSION = 1
+
+_header = struct.Struct('<4sH')
+_start = struct.Struct('<QI')
+_ticks = struct.Struct('<dI')
+_buy = struct.Struct('<IQQ')
+_crc = struct.Struct('<I')
+_length = struct.Struct('<I')
+
+# most elements replay will put in one bulk tick array
+_bulk_elements = 1 << 20
+
+
+class JournalError(Exception):
+    """ The file isn't a journal replay() can read. """
+
+
+def digest(game):
+    """ crc32 of game's state: the Total and every generator, but not the time or achievements. """
+    snapshot = game.snapshot()
+    snapshot['savetime'] = 0.0
+    snapshot['sections'] = {}
+    return zlib.crc32(saves.encode(snapshot))
+
+
+class Journal():
+    """ Records an Engine's events to path. start() reseeds the engine's rng (so its growth
+        rolls can be replayed) and wraps its tick, buy, prestige and reset, like
+        Profiler.wrap(); nothing else about the engine changes.
+
+        >>> journal = Journal('session.journal', seed = 42)
+
+        >>> journal.start(game)
+
+        >>> game.buy(0); game.tick(1.0)        # recorded
+
+        >>> journal.close(game)                # writes the final state
+    """
+
+    def __init__(self, path, seed = None):
+        self.path = path
+        self.seed = seed if seed is not None else int.from_bytes(os.urandom(8), 'little') >> 1
+        self._file = None
+        self._dt = None         # the run of ticks not written yet
+        self._run = 0
+        self._depth = 0         # > 0 while inside a recorded call (prestige() calls reset())
+        return None
+
+    def start(self, game):
+        game.rng = random.Random(self.seed)
+        self._file = open(self.path, 'wb')
+        self._file.write(_header.pack(MAGIC, VERSION))
+        state = saves.encode(game.snapshot())
+        self._write(b'S', _start.pack(self.seed, len(state)) + state)
+        game.tick = self._record(game.tick, self._tick)
+        game.buy = self._record(game.buy, self._buy)
+        game.prestige = self._record(game.prestige, lambda result: self._write(b'P'))
+        game.reset = self._record(game.reset, lambda result: self._write(b'R'))
+        return None
+
+    def _record(self, fn, event):
+        def recorded(*args, **kwargs):
+            if self._depth:
+                return fn(*args, **kwargs)
+            self._depth += 1
+            try:
+                result = fn(*args, **kwargs)
+            finally:
+                self._depth -= 1
+            if self._file is not None:
+                event(result, *args, **kwargs)
+            return result
+        recorded.__wrapped__ = fn
+        return recorded
+
+    def _tick(self, made, dt = 1.0):
+        if dt != self._dt:
+            self._flush_ticks()
+            self._dt = dt
+        self._run += 1
+        return None
+
+    def _buy(self, bought, index, quantity = 1):
+        self._write(b'B', _buy.pack(index, quantity, bought))
+        return None
+
+    def _flush_ticks(self):
+        if self._run:
+            self._file.write(b'T' + _ticks.pack(self._dt, self._run))
+            self._run = 0
+        return None
+
+    def _write(self, kind, payload = b''):
+        self._flush_ticks()
+        self._file.write(kind + payload)
+        return None
+
+    def checkpoint(self, game):
+        """ Record a digest of game's state, so a replay can tell roughly where it went
+        wrong, and push everything so far out to the file. """
+        if self._file is not None:
+            self._write(b'C', _crc.pack(digest(game)))
+            self._file.flush()
+        return None
+
+    def close(self, game):
+        """ Record game's final state and close the file. """
+        if self._file is not None:
+            state = saves.encode(game.snapshot())
+            self._write(b'E', _length.pack(len(state)) + state)
+            self._file.close()
+            self._file = None
+        return None
+
+
+class Replay():
+    """ What replay() did: the game it rebuilt, counts of what it replayed, and any
+    differences from the journal (an empty list when everything matched). """
+
+    def __init__(self):
+        self.game = None
+        self.events = 0
+        self.ticks = 0
+        self.seconds = 0.0          # game time the ticks covered
+        self.buys = 0
+        self.prestiges = 0
+        self.checkpoints = 0
+        self.ended = False          # the journal had its final state
+        self.mismatches = []
+        return None
+
+    @property
+    def ok(self):
+        return self.ended and not self.mismatches
+
+
+def replay(path, catalog = None):
+    """ Redo the journal at path on a fresh Engine and compare it as it goes. catalog is
+    the one the session was played with, if not the stock one (its growth rolls matter
+    for resets). Returns a Replay. Raises JournalError if path isn't a journal. """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < _header.size or data[:4] != MAGIC:
+        raise JournalError(f'{path} is not a pyClicker journal')
+    magic, version = _header.unpack_from(data)
+    if version > VERSION:
+        raise JournalError(f'{path} is journal version {version}, this game only reads up to {VERSION}')
+
+    result = Replay()
+    pos = _header.size
+    try:
+        while pos < len(data):
+            kind = data[pos:pos + 1]
+            pos += 1
+            result.events += 1
+            game = result.game
+            if kind == b'S':
+                seed, length = _start.unpack_from(data, pos)
+                pos += _start.size
+                _check_length(data, pos, length)
+                state = saves.decode(data[pos:pos + length])
+                pos += length
+                result.game = Engine.from_snapshot(state, rng = random.Random(seed), catalog = catalog)
+                result.game.history = None      # statistics only, and not checked
+            elif game is None:
+                raise JournalError(f'{path} does not start with the starting state')
+            elif kind == b'T':
+                dt, count = _ticks.unpack_from(data, pos)
+                pos += _ticks.size
+                run_ticks(game, dt, count)
+                result.ticks += count
+                result.seconds += dt * count
+            elif kind == b'B':
+                index, quantity, bought = _buy.unpack_from(data, pos)
+                pos += _buy.size
+                got = game.buy(index, quantity)
+                result.buys += 1
+                if got != bought:
+                    result.mismatches.append(f'event {result.events}: buy({index}, {quantity}) bought {got}, '
+                                             f'the journal says {bought}')
+            elif kind == b'P':
+                game.prestige()
+                result.prestiges += 1
+            elif kind == b'R':
+                game.reset()
+            elif kind == b'C':
+                crc, = _crc.unpack_from(data, pos)
+                pos += _crc.size
+                result.checkpoints += 1
+                if digest(game) != crc:
+                    result.mismatches.append(f'event {result.events}: state differs at checkpoint '
+                                             f'{result.checkpoints}')
+            elif kind == b'E':
+                length, = _length.unpack_from(data, pos)
+                pos += _length.size
+                _check_length(data, pos, length)
+                final = saves.decode(data[pos:pos + length])
+                pos += length
+                result.mismatches += compare(final, game.snapshot())
+                result.ended = True
+            else:
+                raise JournalError(f'{path}: unknown record {kind!r} at byte {pos - 1}')
+    except struct.error:
+        # cut short mid-record: replay what was there
+        result.events -= 1
+    except saves.SaveError as e:
+        raise JournalError(f'{path}: a saved state in it is damaged ({e})') from e
+    return result
+
+def _check_length(data, pos, length):
+    if pos + length > len(data):
+        raise struct.error('cut short')
+    return None
+
+def compare(expected, actual, most = 10):
+    """ Differences between two snapshots, as lines of text (at most `most` per column). """
+    lines = []
+    for f in saves.total_fields:
+        a, b = expected['total'][f], actual['total'][f]
+        if a != b:
+            lines.append(f'total.{f}: journal {a!r}, replay {b!r}')
+    if list(expected['names']) != list(actual['names']):
+        lines.append('the generators are different')
+        return lines
+    names = expected['names']
+    for c in saves.float_columns + ('owned',):
+        a, b = np.asarray(expected[c]), np.asarray(actual[c])
+        for i in np.flatnonzero(a != b)[:most].tolist():
+            lines.append(f'{names[i]}.{c}: journal {a[i]!r}, replay {b[i]!r}')
+    return lines
+
+def run_ticks(game, dt, count):
+    """ game.tick(dt) count times, with the same result, in bulk where the numbers
+    are plain floats. """
+    rows = max(len(game.bank), 1)
+    while count > 0:
+        k = min(count, max(1, _bulk_elements // rows))
+        if not _bulk_ticks(game, dt, k):
+            for _ in range(k):
+                game.tick(dt)
+        count -= k
+    return None
+
+def _repeat_add(start, step, k):
+    """ start + step + step ... (k times), added one at a time like a loop would. """
+    steps = np.empty((k + 1,) + np.shape(start))
+    steps[0] = start
+    steps[1:] = step
+    with np.errstate(over = 'ignore', invalid = 'ignore'):
+        return np.add.accumulate(steps, axis = 0)[-1]
+
+def _bulk_ticks(game, dt, k):
+    """ k of Engine.tick(dt) at once. Returns False (having changed nothing) when any
+    of the numbers involved isn't a plain float, so the caller can do it the slow way. """
+    t = game.total
+    bank = game.bank
+    if any(isinstance(x, bignum.Big) for x in (t.widgets, t.ltwidgets, t.prestige)):
+        return False
+    scale = float(t.prestige * dt)
+    tw = bank.total_rate(t.prestige)
+    if isinstance(tw, bignum.Big) or not np.isfinite(scale):
+        return False
+    # nothing in a tick changes the rates, so every one of the k ticks adds the same amounts
+    made = tw * dt
+    widgets = float(_repeat_add(float(t.widgets), made, k))
+    ltwidgets = float(_repeat_add(float(t.ltwidgets), made, k))
+    if not (np.isfinite(made) and np.isfinite(widgets) and np.isfinite(ltwidgets)):
+        return False
+    with np.errstate(over = 'ignore'):
+        made_rows = bank.rate * scale
+    bank.widgets[:] = _repeat_add(bank.widgets, made_rows, k)
+    bank.lifetime_widgets[:] = _repeat_add(bank.lifetime_widgets, made_rows, k)
+    t.rate = tw
+    t.widgets = widgets
+    t.ltwidgets = ltwidgets
+    game.achievements.update(RATE, tw)
+    game.achievements.update(LTWIDGETS, ltwidgets)
+    return True
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Replay a pyClicker journal and check it ends the same way.')
+    parser.add_argument('journal')
+    parser.add_argument('--catalog', metavar = 'FILE', help = 'the catalog the session was played with')
+    args = parser.parse_args(argv)
+
+    from catalog import Catalog
+    catalog = Catalog.load(args.catalog) if args.catalog else None
+    started = time.perf_counter()
+    try:
+        result = replay(args.journal, catalog)
+    except (OSError, JournalError) as e:
+        print(e, file = sys.stderr)
+        return 2
+    took = time.perf_counter() - started
+    print(f'{result.events} events: {result.ticks} ticks ({result.seconds / 3600:.1f}h of play), '
+          f'{result.buys} buys, {result.prestiges} prestiges, {result.checkpoints} checkpoints, '
+          f'replayed in {took:.2f}s')
+    for line in result.mismatches:
+        print('MISMATCH:', line)
+    if not result.ended:
+        print('the journal has no final state (cut short?), so the end could not be checked')
+    elif not result.mismatches:
+        print('final state matches')
+    return 0 if result.ok else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,206 @@
+# pyClicker IDLE game - when to restart
+# A restart swaps the current prestige multiplier for one worked out from
+# lifetime widgets (150 * sqrt(ltwidgets / 1e14)), so waiting always raises the
+# bonus but the gain per hour of the run eventually falls off. The planner
+# projects lifetime widgets forward, under the current generators and a buy
+# policy, and finds the restart time with the best prestige gained per hour.
+#
+# The projection is one fast_forward() on a copy of the game, kept as a list
+# of segments: between two purchases the rate is fixed, so lifetime widgets
+# grow in a straight line and any time can be looked up exactly. It's only
+# redone when the game stops following it (a restart, a purchase the policy
+# wouldn't have made, running past its end); otherwise a plan is a few numpy
+# operations over the candidate restart times. A projection can take seconds
+# on a long catalog, so it runs on a worker thread, and plans carry on from
+# the last one (or there's no plan yet) until it's done.
+import math
+import threading
+import time
+
+import numpy as np
+
+import bignum
+from fastforward import fast_forward
+
+# how far ahead the projection runs, and how many restart times are looked at in it
+horizon = 24 * 3600
+candidates = 96
+
+# the projection is redone when lifetime widgets drift this far from it (log10, ~1%)
+drift = 0.005
+# but not more often than this (seconds), as a projection takes a good fraction of a second
+min_replan = 120
+
+_ln10 = math.log(10)
+
+
+def bonus_from_log10(log_ltwidgets):
+    """ Engine.new_prestige() for an array of log10(ltwidgets), without rounding. """
+    log_ltwidgets = np.asarray(log_ltwidgets, dtype = float)
+    with np.errstate(over = 'ignore'):
+        bonus = np.maximum(150 * 10.0 ** ((log_ltwidgets - 14) / 2), 1.0)
+    return np.where(log_ltwidgets > 3, bonus, 1.0)
+
+
+class Plan():
+    """ What Planner.plan() found: restart in `wait` seconds for a bonus of `bonus`, which
+    works out to `per_hour` prestige gained per hour of the run. now_bonus and now_per_hour
+    are the same for restarting straight away. beyond is True when the best time found is
+    the end of the projection, i.e. waiting even longer may well be better still. """
+
+    __slots__ = ('wait', 'bonus', 'per_hour', 'now_bonus', 'now_per_hour', 'beyond')
+
+    def __init__(self, wait, bonus, per_hour, now_bonus, now_per_hour, beyond = False):
+        self.wait = wait
+        self.bonus = bonus
+        self.per_hour = per_hour
+        self.now_bonus = now_bonus
+        self.now_per_hour = now_per_hour
+        self.beyond = beyond
+        return None
+
+    def __repr__(self):
+        return f'Plan(wait = {self.wait:.0f}, bonus = {self.bonus:.2f}, per_hour = {self.per_hour:.3g})'
+
+    @property
+    def now(self):
+        """ Restarting now is (as good as) the best there is. """
+        return self.wait <= 0
+
+
+class Planner():
+    """ Plans restarts for an Engine. plan() is cheap enough to call every frame.
+
+        >>> planner = Planner(game, policy = fastforward.best_value)
+
+        >>> plan = planner.plan()       # Plan(wait = 5400, bonus = 14.20, per_hour = 2.03), or None
+                                        # while the first projection is being worked out
+
+        >>> planner.plan(wait = True)   # waits for it instead
+
+        >>> planner.text(plan)          # 'Best restart in 1h30m: x14.20 (+2.03/h)'
+    """
+
+    def __init__(self, game, policy = None, horizon = horizon, clock = time.time):
+        self.game = game
+        self.policy = policy
+        self.horizon = horizon
+        self.clock = clock
+        # restart times looked at, as offsets from when the plan is made
+        self.offsets = np.concatenate(([0.0], np.geomspace(60, horizon, candidates - 1)))
+        self.projections = 0            # how many times the game has been projected
+        self._made = None               # clock() when the projection in use was made
+        self._worker = None             # the thread working out the next one
+        self._done = None               # its result, until plan() takes it up
+        return None
+
+    def _start_projection(self):
+        """ Copy the game (on this thread, the one that plays it) and run the copy forward
+        over the horizon on a worker, noting where each purchase changed the rate. """
+        game = self.game
+        scratch = game.copy()
+        made, prestige, run_started = self.clock(), game.total.prestige, game.run_started
+
+        def project():
+            starts = [0.0]
+            lifetime = [scratch.total.ltwidgets]
+            rates = [scratch.bank.total_rate(scratch.total.prestige)]
+
+            def bought(engine, elapsed, index, quantity):
+                if elapsed == starts[-1]:
+                    # several purchases at once: only the rate after the last one matters
+                    del starts[-1], lifetime[-1], rates[-1]
+                starts.append(elapsed)
+                lifetime.append(engine.total.ltwidgets)
+                rates.append(engine.bank.total_rate(engine.total.prestige))
+                return None
+
+            fast_forward(scratch, self.horizon, self.policy, on_buy = bought)
+            self._done = (np.array(starts), np.array([bignum.log10(x) for x in lifetime]),
+                          np.array([bignum.log10(x) for x in rates]), made, prestige, run_started)
+            return None
+
+        self._worker = threading.Thread(target = project, name = 'planner', daemon = True)
+        self._worker.start()
+        return None
+
+    def _take_projection(self):
+        done, self._done = self._done, None
+        self._starts, self._log_lifetime, self._log_rate, self._made, self._prestige, self._run_started = done
+        self._worker = None
+        self.projections += 1
+        return None
+
+    def log_lifetime(self, t):
+        """ log10 of projected lifetime widgets t seconds after the projection was made. """
+        t = np.asarray(t, dtype = float)
+        k = np.searchsorted(self._starts, t, side = 'right') - 1
+        with np.errstate(divide = 'ignore'):
+            grown = self._log_rate[k] + np.log10(t - self._starts[k])
+        return np.logaddexp(self._log_lifetime[k] * _ln10, grown * _ln10) / _ln10
+
+    def _usable(self, elapsed):
+        """ The projection is of this run, and still has time left in it. """
+        game = self.game
+        return self._made is not None and game.total.prestige == self._prestige and \
+               game.run_started == self._run_started and elapsed < self.horizon
+
+    def _stale(self, elapsed):
+        if not self._usable(elapsed) or elapsed > self.horizon / 2:
+            return True
+        if elapsed < min_replan:
+            return False
+        return abs(self.log_lifetime(elapsed) - bignum.log10(self.game.total.ltwidgets)) > drift
+
+    def plan(self, wait = False):
+        """ The best time to restart, from now on, or None while there's no projection of
+        this run yet (with wait, this waits for it). """
+        if self._done is not None:
+            self._take_projection()
+        now = self.clock()
+        elapsed = now - self._made if self._made is not None else 0.0
+        if self._stale(elapsed):
+            if self._worker is None:
+                self._start_projection()
+            if wait:
+                self._worker.join()
+                return self.plan()
+            if not self._usable(elapsed):
+                return None
+        game = self.game
+        offsets = self.offsets[self.offsets <= self.horizon - elapsed]
+        # rounded like Engine.new_prestige(), so a later candidate can't look better by a fraction
+        bonus = np.round(bonus_from_log10(self.log_lifetime(elapsed + offsets)), 2)
+        bonus[0] = game.new_prestige()
+        prestige = float(game.total.prestige)
+        run = np.maximum(now - game.run_started + offsets, 1.0) / 3600
+        per_hour = (bonus - prestige) / run
+        # waiting only counts when it gets somewhere past the current prestige
+        per_hour[1:][bonus[1:] <= prestige] = -np.inf
+        best = int(np.argmax(per_hour))
+        return Plan(float(offsets[best]), float(bonus[best]), float(per_hour[best]), float(bonus[0]),
+                    float(per_hour[0]), beyond = 0 < best == len(offsets) - 1)
+
+    def text(self, plan = None):
+        """ One line for the reset button. """
+        plan = plan if plan is not None else self.plan()
+        if plan is None:
+            return 'Working out the best restart...'
+        if plan.per_hour <= 0:
+            return 'Restarting won\'t raise the bonus yet'
+        if plan.beyond:
+            return f'Keep going: x{plan.bonus:,.2f} (+{plan.per_hour:,.3g}/h) in {duration(plan.wait)}, and rising'
+        when = 'now' if plan.now else f'in {duration(plan.wait)}'
+        return f'Best restart {when}: x{plan.bonus:,.2f} (+{plan.per_hour:,.3g}/h)'
+
+
+def duration(seconds):
+    """ '45s', '12m', '3h05m', '2d04h' """
+    seconds = int(seconds)
+    if seconds < 60:
+        return f'{seconds}s'
+    if seconds < 3600:
+        return f'{seconds // 60}m'
+    if seconds < 86400:
+        return f'{seconds // 3600}h{seconds % 3600 // 60:02d}m'
+    return f'{seconds // 86400}d{seconds % 86400 // 3600:02d}h'
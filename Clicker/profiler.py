@@ -0,0 +1,135 @@
+# pyClicker IDLE game - built-in profiling
+# Per-phase timing histograms, game loop lateness and widget reconfigure
+# counts, for long sessions without an external profiler. When profiling is
+# off, wrap() hands back the original function untouched, so the game pays
+# nothing for it.
+import json
+import time
+
+# histogram buckets are powers of two microseconds: bucket b holds [2**(b-1), 2**b) us
+buckets = 32
+
+class Profiler():
+    """ Collects timings and counts.
+
+        >>> prof = Profiler(enabled = True)
+
+        >>> tick = prof.wrap('update_totals', game.tick)     # time every call
+
+        >>> prof.count('button reconfigure', 3)
+
+        >>> prof.dump('profile.json')
+    """
+
+    def __init__(self, enabled = False):
+        self.enabled = enabled
+        self.phases = {}        # name -> [calls, total seconds, max seconds, histogram]
+        self.counters = {}
+        self.started = time.perf_counter()
+        return None
+
+    def __bool__(self):
+        return self.enabled
+
+    def wrap(self, name, fn):
+        """ fn, timed under name when profiling is on; fn itself when it's off. """
+        if not self.enabled:
+            return fn
+        clock = time.perf_counter
+        record = self.record
+
+        def timed(*args, **kwargs):
+            t = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, clock() - t)
+        timed.__wrapped__ = fn
+        return timed
+
+    def record(self, name, seconds):
+        """ Add one timing (in seconds) to phase name. """
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = [0, 0.0, 0.0, [0] * buckets]
+        phase[0] += 1
+        phase[1] += seconds
+        if seconds > phase[2]:
+            phase[2] = seconds
+        phase[3][min(int(seconds * 1e6).bit_length(), buckets - 1)] += 1
+        return None
+
+    def count(self, name, n = 1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+        return None
+
+    @staticmethod
+    def _percentile(histogram, calls, p):
+        """ Upper edge (us) of the bucket holding the p'th percentile. """
+        target = calls * p
+        seen = 0
+        for b, n in enumerate(histogram):
+            seen += n
+            if n and seen >= target:
+                return float(2 ** b)
+        return 0.0
+
+    def summary(self):
+        phases = {}
+        for name, (calls, total, worst, histogram) in self.phases.items():
+            phases[name] = {'calls': calls,
+                            'total_ms': total * 1e3,
+                            'mean_us': total / calls * 1e6,
+                            'max_us': worst * 1e6,
+                            'p50_us': self._percentile(histogram, calls, 0.5),
+                            'p99_us': self._percentile(histogram, calls, 0.99),
+                            'histogram_us': {f'<{2 ** b}': n for b, n in enumerate(histogram) if n},
+                            }
+        return {'seconds': time.perf_counter() - self.started, 'phases': phases, 'counters': dict(self.counters)}
+
+    def text(self):
+        """ A few lines for the debug overlay. """
+        s = self.summary()
+        lines = [f"{'phase':<22}{'calls':>8}{'mean us':>10}{'p99 us':>10}{'max us':>10}"]
+        for name, p in sorted(s['phases'].items()):
+            lines.append(f"{name[:21]:<22}{p['calls']:>8}{p['mean_us']:>10.0f}{p['p99_us']:>10.0f}{p['max_us']:>10.0f}")
+        for name, n in sorted(s['counters'].items()):
+            lines.append(f'{name[:30]:<30}{n:>10}')
+        return '\n'.join(lines)
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent = 1)
+        return None
+
+
+class StartupTimer():
+    """ Seconds from `started` (a time.perf_counter() reading, taken as early as possible)
+        to each stage of startup. Stages are recorded once; marking one again does nothing.
+
+        >>> timer = StartupTimer(started)
+
+        >>> timer.mark('first frame')
+
+        >>> timer.text()            # 'first frame  0.081s ...'
+    """
+
+    def __init__(self, started = None):
+        self.started = started if started is not None else time.perf_counter()
+        self.marks = {}         # stage -> seconds, in the order they happened
+        return None
+
+    def mark(self, stage):
+        if stage not in self.marks:
+            self.marks[stage] = time.perf_counter() - self.started
+        return None
+
+    def text(self):
+        return '\n'.join(f'{stage:<22}{seconds:>8.3f}s' for stage, seconds in self.marks.items())
+
+    def dump(self, path, **extra):
+        """ Write the marks as JSON, with anything in extra (e.g. the catalog size) alongside. """
+        with open(path, 'w') as f:
+            json.dump(dict(extra, seconds = self.marks), f, indent = 1)
+        return None
@@ -0,0 +1,77 @@
+# pyClicker IDLE game - purchase math
+# With k owned, n more of a generator cost the geometric sum
+#   b * r**k * (r**n - 1) / (r - 1)
+# and the most that amount widgets buy is that solved for n, which takes a
+# logarithm. Logs round: right at a boundary they can land a hair over the
+# integer when the truth is a hair under, so "max" offered one more than buy()
+# would then let you pay for (or one fewer, leaving widgets unspent).
+#
+# So the log answer is only used as it stands where it's clearly between two
+# integers. Within `tolerance` of one, n and n + 1 are priced the way buy()
+# will actually be charged (GeneratorBank.price) and n is stepped until
+#   price(n) <= amount < price(n + 1)
+# That's a handful of rows per call at most, usually none, so the batched
+# pass costs the same as before. test_purchase.py checks it against exact
+# rational arithmetic.
+import math
+
+import numpy as np
+
+import bignum
+
+# how close to an integer the log answer must be to get checked. Its rounding error is
+# around 1e-12 for any n a catalog will see, so this is generous and still almost never hit.
+tolerance = 1e-6
+
+
+def estimate(ln_amount, ln_base, growth):
+    """ The real n where n more would cost exactly the amount, from logs (arrays of
+    ln(b * r**k) and r). Good at any size, but only to rounding. """
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        x = ln_amount + np.log(growth - 1) - ln_base
+        return np.logaddexp(x, 0) / np.log(growth)
+
+def settle(price, index, n, amount):
+    """ Step n until price(index, n) <= amount < price(index, n + 1). """
+    n = max(n, 0)
+    while n > 0 and price(index, n) > amount:
+        n -= 1
+    while price(index, n + 1) <= amount:
+        n += 1
+    return n
+
+def max_affordable(amount, cost_base, growth, ln_base, price, first = 0):
+    """ How many more of each row amount (a float or Big) buys: arrays of cost_base, growth
+    and ln(cost_base * growth**owned), for rows first, first + 1, ... of a bank whose
+    price(index, n) is what n more cost. Free rows (cost_base 0) come back as 0. """
+    if not amount > 0:
+        return np.zeros(len(growth), dtype = np.int64)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        x = bignum.ln(amount) + np.log(growth - 1) - ln_base
+        n_real = np.logaddexp(x, 0) / np.log(growth)
+        n = np.floor(n_real)
+        near = np.abs(n_real - np.rint(n_real)) < tolerance
+    ok = np.isfinite(n) & (cost_base > 0)
+    n = np.where(ok, n, 0).astype(np.int64)
+    near &= ok
+    if near.any():
+        for j in np.flatnonzero(near).tolist():
+            n[j] = settle(price, first + j, int(n[j]), amount)
+    return n
+
+def max_affordable_one(amount, b, r, r_k, ln_base, price, index):
+    """ max_affordable() for a single row (index), in floats where they suffice. b > 0 and
+    amount > 0; ln_base is only looked at past float range. """
+    try:
+        n_real = math.log(((amount * (r - 1)) / (b * r_k)) + 1, r)
+    except (ValueError, OverflowError, ZeroDivisionError):
+        n_real = math.inf
+    if not math.isfinite(n_real):
+        # too big for floats either way round: solve it in logs
+        n_real = float(estimate(bignum.ln(amount), float(ln_base[index]), r))
+        if not math.isfinite(n_real):
+            return 0
+    n = math.floor(n_real)
+    if tolerance <= n_real - n <= 1 - tolerance:
+        return n
+    return settle(price, index, n, amount)
@@ -0,0 +1,232 @@
+# pyClicker IDLE game - buy button drawing
+# Only redraw what changed: a button's label depends on how many are owned,
+# the growth roll, how many are affordable, the quantity selected and the
+# prestige multiplier. Rows where none of those moved are skipped, and Tk is
+# only told about text or colours that are actually different.
+#
+# There are only ever a page's worth of buttons. Scrolling rebinds them to a
+# different run of generators, so the number of widgets (and the work per
+# refresh) doesn't grow with the catalog.
+#
+# The history graph works the same way: each refresh() only draws the line
+# segments for samples added since the last one, and drops the ones that have
+# scrolled off the left.
+from collections import deque
+
+import numpy as np
+
+import bignum
+from engine import BUY_MAX
+
+# buttons on screen at once; the stock catalog fits on one page
+default_page = 18
+
+class BuyButtons():
+    """ Draws a window of an Engine's generators onto a list of tk.Buttons: button j
+        shows generator first + j.
+
+        >>> buttons = BuyButtons(game, [tk.Button(root) for j in range(default_page)], 'grey20')
+
+        >>> buttons.refresh(quantity = 10)      # returns how many widgets were reconfigured
+
+        >>> buttons.scroll_to(100)              # show generators 100 to 117
+    """
+
+    def __init__(self, engine, buttons, normal_bg, affordable_bg = 'darkgreen'):
+        self.engine = engine
+        self.buttons = buttons
+        self.first = 0
+        self.normal_bg = normal_bg
+        self.affordable_bg = affordable_bg
+        self.shown = [(None, None)] * len(buttons)   # (text, bg) each button is showing
+        self.reconfigured = 0                         # running count of widget config calls
+        self.invalidate()
+        return None
+
+    def invalidate(self):
+        """ Forget what was drawn from, so the next refresh() rebuilds every label. """
+        n = len(self.buttons)
+        self._owned = np.full(n, -1, dtype = np.int64)
+        self._growth = np.zeros(n)
+        self._m = np.full(n, -1, dtype = np.int64)
+        self._quantity = None
+        self._prestige = None
+        return None
+
+    def index(self, slot):
+        """ The generator button slot is showing. """
+        return self.first + slot
+
+    def last_first(self):
+        """ The furthest scroll_to() can go. """
+        return max(len(self.engine.bank) - len(self.buttons), 0)
+
+    def scroll_to(self, first):
+        """ Show generators from first on (clamped to the catalog). Returns True if that
+        moved the window; refresh() then redraws the rebound buttons. """
+        first = min(max(int(first), 0), self.last_first())
+        if first == self.first:
+            return False
+        self.first = first
+        self.invalidate()
+        return True
+
+    def refresh(self, quantity):
+        """ Bring the buttons up to date for the selected quantity. Returns the number of
+        buttons that had to be reconfigured. Only the generators on screen are looked at. """
+        bank = self.engine.bank
+        rows = slice(self.first, self.first + len(self.buttons))
+        m = bank.max_buyable(self.engine.total.widgets, rows)
+        n = len(m)
+        owned = bank.owned[rows]
+        growth = bank.growth[rows]
+        prestige = self.engine.total.prestige
+
+        if quantity != self._quantity or prestige != self._prestige:
+            dirty = np.ones(n, dtype = bool)
+        else:
+            dirty = (owned != self._owned) | (growth != self._growth) | (m != self._m)
+        self._owned = owned.copy()
+        self._growth = growth.copy()
+        self._m = m
+        self._quantity = quantity
+        self._prestige = prestige
+
+        changed = 0
+        for j in np.flatnonzero(dirty):
+            j = int(j)
+            i = self.first + j
+            changed += self.draw(j, self.text(i, quantity, int(m[j])), self.colour(i, quantity, int(m[j])))
+        return changed
+
+    def text(self, i, value, m):
+        """ Button label for generator i, with m of them affordable. """
+        g = self.engine.generators[i]
+        if i == 0:
+            return f"+{g.name}\n({g.owned})"
+
+        # We want to show the cost (c) of the number of items (value) the
+        # user has selected to buy. If user has selected max (value == BUY_MAX),
+        # and the max buyable (m) is 0, we should display the cost of 1 item.
+        c = round(g.bulk_cost(value if value != BUY_MAX else (m if m > 0 else 1)),0)
+        rate = round(bignum.mul(g.rate, self.engine.total.prestige),2)
+        return f"+{g.name} ({c:,.6G}) (^{g.growth})\n({g.owned}, +{rate:,.6G}/s) (+{m})"
+
+    def colour(self, i, value, m):
+        if (m >= value or (value == BUY_MAX and m >= 1) or i == 0) and value:
+            return self.affordable_bg
+        return self.normal_bg
+
+    def draw(self, j, text, bg):
+        """ Push text and bg to button j, skipping whatever it already shows.
+        Returns 1 if the widget was touched, else 0. """
+        old_text, old_bg = self.shown[j]
+        if text == old_text and bg == old_bg:
+            return 0
+        changes = {}
+        if text != old_text:
+            changes['text'] = text
+        if bg != old_bg:
+            changes['bg'] = bg
+        self.buttons[j].config(**changes)
+        self.shown[j] = (text, bg)
+        self.reconfigured += 1
+        return 1
+
+
+class HistoryGraph():
+    """ Plots the total rate kept by a History (history.py), on a log scale, onto a
+        tk.Canvas. Sample j sits at x = j * spacing; the canvas is scrolled to show the
+        newest `shown` samples, so old segments never move.
+
+        >>> graph = HistoryGraph(tk.Canvas(top, width = 480, height = 160), game.history, game.bank.names)
+
+        >>> graph.refresh()             # draws whatever is new, returns how many segments
+
+        >>> graph.set_level(2)          # per hour instead
+    """
+
+    def __init__(self, canvas, history, names, level = 1, spacing = 2, colour = 'green2'):
+        self.canvas = canvas
+        self.history = history
+        self.names = list(names)
+        self.spacing = spacing
+        self.colour = colour
+        self.width = int(canvas['width'])
+        self.height = int(canvas['height'])
+        self.shown = self.width // spacing
+        self.set_level(level)
+        return None
+
+    def set_level(self, level):
+        """ Switch resolution (an index into history.levels) and draw it from scratch. """
+        self.level = level
+        self.redraw()
+        return None
+
+    def redraw(self):
+        self.canvas.delete('all')
+        self._segments = deque()        # (j, canvas item) oldest first
+        self._next = 0                  # first sample not drawn yet
+        self._last = None               # (x, y) the line ends at
+        level = self.history.levels[self.level]
+        j, log_rate, shares = level.samples(max(level.count - self.shown, 0))
+        finite = log_rate[np.isfinite(log_rate)]
+        low, high = (float(finite.min()), float(finite.max())) if finite.size else (0.0, 1.0)
+        self._scale(low, high)
+        self.refresh()
+        return None
+
+    def _scale(self, low, high):
+        # whole decades, with room to grow before the next redraw
+        self.low = np.floor(low) - 1
+        self.high = max(np.ceil(high) + 1, self.low + 2)
+        return None
+
+    def _y(self, log_rate):
+        if not np.isfinite(log_rate):
+            return float(self.height)
+        return self.height * (self.high - log_rate) / (self.high - self.low)
+
+    def refresh(self):
+        """ Draw the samples added since the last call. Returns the segments drawn. """
+        level = self.history.levels[self.level]
+        j, log_rate, shares = level.samples(max(self._next, level.count - self.shown))
+        if not len(j):
+            return 0
+        finite = log_rate[np.isfinite(log_rate)]
+        if finite.size and (finite.min() < self.low or finite.max() > self.high):
+            # off the scale: everything on screen moves, so start over
+            self.redraw()
+            return len(self._segments)
+
+        drawn = 0
+        for k, v in zip(j.tolist(), log_rate.tolist()):
+            point = (k * self.spacing, self._y(v))
+            if self._last is not None and self._last[0] == point[0] - self.spacing:
+                self._segments.append((k, self.canvas.create_line(*self._last, *point, fill = self.colour)))
+                drawn += 1
+            self._last = point
+        self._next = int(j[-1]) + 1
+
+        oldest = self._next - self.shown
+        while self._segments and self._segments[0][0] <= oldest:
+            self.canvas.delete(self._segments.popleft()[1])
+        right = self._next * self.spacing
+        self.canvas.configure(scrollregion = (right - self.width, 0, right, self.height))
+        self.canvas.xview_moveto(0)
+        return drawn
+
+    def caption(self):
+        """ A line of text for under the graph: the scale, and who makes the most right now. """
+        step = self.history.levels[self.level].step
+        text = f'{_step_names.get(step, f"every {step:g}s")}, 1e{self.low:g} to 1e{self.high:g} /s'
+        level = self.history.levels[self.level]
+        if level.count and self.history.tracked:
+            j, log_rate, shares = level.samples(level.count - 1)
+            top = int(shares[-1].argmax())
+            text += f'   mostly {self.names[top]} ({shares[-1][top]:.0%})'
+        return text
+
+
+_step_names = {1: 'per second', 60: 'per minute', 3600: 'per hour', 86400: 'per day'}
@@ -0,0 +1,241 @@
+# pyClicker IDLE game - save files
+# A fixed binary layout instead of pickles: quick to read (the generator
+# columns go straight into numpy), safe to load, and not tied to the class
+# layout. Writes go to a temp file that is renamed over the save, so a crash
+# mid-write leaves the last good save in place.
+#
+# Layout (little endian), version 1:
+#   'PYCK'  u16 version  u32 payload length  payload  u32 crc32(payload)
+#   payload:
+#     f64 savetime
+#     Total: widgets, rate, idle_widgets, prestige, spent, ltwidgets as (f64 mantissa, i32 exponent)
+#     u32 n, u32 names length, names (utf-8, '\0' separated)
+#     f64[n] cost_base, rate_base, growth, widgets, lifetime_widgets   i64[n] owned
+#     then any number of sections: 4 byte tag, u32 length, bytes (unknown tags are skipped)
+#
+# Sections:
+#   'MILE'  i64[n] every, f64[n] factor (the milestone bonus; saves without it use 25 and 2)
+#   'ACHV'  unlocked achievements, JSON {key: unix time unlocked}
+#   'HIST'  production history, see History.pack() in history.py
+#   'RUNT'  f64 unix time the current run (since the last restart) began
+import json
+import os
+import queue
+import struct
+import tempfile
+import threading
+import zlib
+
+import numpy as np
+
+from bignum import Big
+
+MAGIC = b'PYCK'
+VERSION = 1
+
+total_fields = ('widgets', 'rate', 'idle_widgets', 'prestige', 'spent', 'ltwidgets')
+float_columns = ('cost_base', 'rate_base', 'growth', 'widgets', 'lifetime_widgets')
+
+_header = struct.Struct('<4sHI')
+_number = struct.Struct('<di')
+_count = struct.Struct('<II')
+_section = struct.Struct('<4sI')
+_crc = struct.Struct('<I')
+_run = struct.Struct('<d')
+
+MILESTONES = b'MILE'
+ACHIEVEMENTS = b'ACHV'
+HISTORY = b'HIST'
+RUN = b'RUNT'
+
+
+class SaveError(Exception):
+    """ The file is there, but isn't a save we can read (damaged, or from a newer version).
+    .path is the file, when known. """
+    path = None
+
+
+class NotASave(SaveError):
+    """ The file doesn't start with the save header at all (e.g. an old pickle save). """
+
+
+def _pack_number(x):
+    if isinstance(x, Big):
+        return _number.pack(x.m, x.e)
+    return _number.pack(float(x), 0)
+
+def _unpack_number(m, e):
+    # plain floats are stored with exponent 0, Big never has one
+    return Big(m, e) if e else m
+
+def encode(snapshot):
+    """ Bytes for a snapshot dict (see Engine.snapshot()). """
+    names = '\0'.join(snapshot['names']).encode('utf-8')
+    n = len(snapshot['names'])
+    parts = [struct.pack('<d', snapshot['savetime'])]
+    parts += [_pack_number(snapshot['total'][f]) for f in total_fields]
+    parts.append(_count.pack(n, len(names)))
+    parts.append(names)
+    parts += [np.ascontiguousarray(snapshot[c], dtype = '<f8').tobytes() for c in float_columns]
+    parts.append(np.ascontiguousarray(snapshot['owned'], dtype = '<i8').tobytes())
+    for tag, data in snapshot.get('sections', {}).items():
+        parts.append(_section.pack(tag, len(data)))
+        parts.append(data)
+    payload = b''.join(parts)
+    return _header.pack(MAGIC, VERSION, len(payload)) + payload + _crc.pack(zlib.crc32(payload))
+
+def decode(data):
+    """ Snapshot dict from bytes. Raises NotASave or SaveError. """
+    if len(data) < _header.size or data[:4] != MAGIC:
+        raise NotASave('not a pyClicker save')
+    magic, version, length = _header.unpack_from(data)
+    if version > VERSION:
+        raise SaveError(f'save is version {version}, this game only reads up to {VERSION}')
+    end = _header.size + length
+    if len(data) < end + _crc.size:
+        raise SaveError('save is truncated')
+    payload = memoryview(data)[_header.size:end]
+    if zlib.crc32(payload) != _crc.unpack_from(data, end)[0]:
+        raise SaveError('save is damaged (checksum mismatch)')
+
+    try:
+        snapshot = {'savetime': struct.unpack_from('<d', payload)[0], 'total': {}, 'sections': {}}
+        pos = 8
+        for f in total_fields:
+            snapshot['total'][f] = _unpack_number(*_number.unpack_from(payload, pos))
+            pos += _number.size
+        n, names_len = _count.unpack_from(payload, pos)
+        pos += _count.size
+        names = bytes(payload[pos:pos + names_len]).decode('utf-8')
+        snapshot['names'] = names.split('\0') if n else []
+        pos += names_len
+        for c in float_columns:
+            snapshot[c] = np.frombuffer(payload, dtype = '<f8', count = n, offset = pos).astype(float)
+            pos += 8 * n
+        snapshot['owned'] = np.frombuffer(payload, dtype = '<i8', count = n, offset = pos).astype(np.int64)
+        pos += 8 * n
+        while pos < length:
+            tag, size = _section.unpack_from(payload, pos)
+            pos += _section.size
+            snapshot['sections'][tag] = bytes(payload[pos:pos + size])
+            pos += size
+    except (struct.error, ValueError, UnicodeDecodeError) as e:
+        raise SaveError(f'save is damaged ({e})') from e
+    return snapshot
+
+def pack_milestones(every, factor):
+    return np.ascontiguousarray(every, dtype = '<i8').tobytes() + np.ascontiguousarray(factor, dtype = '<f8').tobytes()
+
+def unpack_milestones(data, n):
+    """ (every, factor) arrays from a MILESTONES section for n generators. """
+    if len(data) != 16 * n:
+        raise SaveError(f'milestone section is {len(data)} bytes, expected {16 * n}')
+    every = np.frombuffer(data, dtype = '<i8', count = n).astype(np.int64)
+    factor = np.frombuffer(data, dtype = '<f8', count = n, offset = 8 * n).astype(float)
+    return every, factor
+
+def pack_achievements(unlocked):
+    return json.dumps(unlocked, separators = (',', ':')).encode('utf-8')
+
+def unpack_achievements(data):
+    """ {key: time unlocked} from an ACHIEVEMENTS section. """
+    try:
+        unlocked = json.loads(data.decode('utf-8'))
+    except (UnicodeDecodeError, ValueError) as e:
+        raise SaveError(f'achievement section is damaged ({e})') from e
+    if not isinstance(unlocked, dict):
+        raise SaveError('achievement section is damaged')
+    return unlocked
+
+def pack_run(started):
+    return _run.pack(started)
+
+def unpack_run(data):
+    """ The run's start time from a RUN section. """
+    if len(data) != _run.size:
+        raise SaveError(f'run section is {len(data)} bytes, expected {_run.size}')
+    return _run.unpack(data)[0]
+
+def write(path, snapshot):
+    """ Atomically replace path with snapshot: write a temp file beside it, flush it
+    to disk, then rename it over the old save. """
+    data = encode(snapshot)
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix = os.path.basename(path) + '.', suffix = '.tmp', dir = folder)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return None
+
+def read(path):
+    """ Snapshot dict from path. FileNotFoundError if there's no save, NotASave or
+    SaveError if there's something else there. """
+    with open(path, 'rb') as f:
+        data = f.read()
+    try:
+        return decode(data)
+    except SaveError as e:
+        e.path = path
+        raise
+
+
+class Autosaver():
+    """ Writes snapshots from a background thread, so saving never stalls the Tk loop.
+        Take the snapshot on the thread that owns the game (it's just array copies),
+        then submit() it. Only the newest pending snapshot is kept.
+
+        >>> saver = Autosaver('clickersave.dat')
+
+        >>> saver.submit(game.snapshot())
+
+        >>> saver.stop()         # waits for the last write to finish
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.error = None             # last exception from a write, if any
+        self._pending = queue.Queue(maxsize = 1)
+        self._thread = threading.Thread(target = self._run, name = 'autosave', daemon = True)
+        self._thread.start()
+        return None
+
+    def submit(self, snapshot):
+        """ Queue snapshot for writing, replacing one that hasn't been written yet. """
+        while True:
+            try:
+                self._pending.put_nowait(snapshot)
+                return None
+            except queue.Full:
+                try:
+                    self._pending.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def stop(self):
+        """ Finish any pending write and end the thread. Safe to call again. """
+        if not self._thread.is_alive():
+            return None
+        self._pending.put(None)
+        self._thread.join()
+        return None
+
+    def _run(self):
+        while True:
+            snapshot = self._pending.get()
+            if snapshot is None:
+                return None
+            try:
+                write(self.path, snapshot)
+                self.error = None
+            except Exception as e:
+                # a snapshot that won't encode mustn't end the thread: stop() would wait forever
+                self.error = e
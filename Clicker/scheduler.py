@@ -0,0 +1,76 @@
+# pyClicker IDLE game - game loop timing
+# The economy runs on a fixed step measured against a monotonic clock, so a
+# slow redraw or a modal dialog delays the display but never costs
+# production. Drawing happens separately, at its own (throttled) frame rate.
+import time
+
+class Scheduler():
+    """ Drives simulate(dt) and render() from a Tk widget's after() loop.
+
+        Elapsed time is accumulated from clock() and simulated in whole steps. After a
+        stall, at most max_steps steps are run one by one; anything further behind is
+        credited in a single simulate() call (production is linear between purchases,
+        so that's exact). render() runs at most fps times a second.
+
+        >>> loop = Scheduler(root, simulate = game.tick, render = draw, step = 1.0, fps = 4)
+
+        >>> loop.start()
+    """
+
+    def __init__(self, widget, simulate, render, step = 1.0, fps = 4, max_steps = 10, clock = time.monotonic, \
+                 profiler = None):
+        self.widget = widget
+        self.simulate = simulate
+        self.render = render
+        self.step = step
+        self.fps = fps
+        self.max_steps = max_steps
+        self.clock = clock
+        self.profiler = profiler    # a profiler.Profiler, to record tick jitter
+        self.afterid = None
+        self.simulated = 0.0        # seconds of game time run so far
+        return None
+
+    def start(self):
+        self.last = self.clock()
+        self.accumulated = 0.0
+        self.last_render = None
+        self.afterid = self.widget.after(self._delay(), self.pump)
+        return None
+
+    def stop(self):
+        if self.afterid is not None:
+            self.widget.after_cancel(self.afterid)
+            self.afterid = None
+        return None
+
+    def _delay(self):
+        """ ms until the next pump: whichever comes first of the next step or frame. """
+        return max(1, int(1000 * min(self.step, 1 / self.fps)))
+
+    def pump(self):
+        """ One pass of the loop: catch the simulation up with the clock, then draw if a
+        frame is due. """
+        now = self.clock()
+        self.accumulated += now - self.last
+        self.last = now
+
+        steps = int(self.accumulated // self.step)
+        if steps:
+            self.accumulated -= steps * self.step
+            if self.profiler:
+                # how long after it fell due the latest step actually ran
+                self.profiler.record('tick jitter', self.accumulated)
+                self.profiler.count('catch-up steps', steps - 1)
+            for _ in range(min(steps, self.max_steps)):
+                self.simulate(self.step)
+            if steps > self.max_steps:
+                self.simulate((steps - self.max_steps) * self.step)
+            self.simulated += steps * self.step
+
+        if self.last_render is None or now - self.last_render >= 1 / self.fps:
+            self.last_render = now
+            self.render()
+
+        self.afterid = self.widget.after(self._delay(), self.pump)
+        return None
@@ -0,0 +1,489 @@
+# pyClicker IDLE game - game server
+# Hosts many independent games, one per player profile, in one process. Each
+# is an engine.Engine, so the buy and prestige rules are the window's. Every
+# loaded game's generators live in one shared GeneratorBank, a fixed run of
+# rows each, so ticking all of them is a few numpy operations per interval
+# rather than a Python loop over games. Games left idle are saved to their
+# profile and dropped; the next request for one loads it again and credits
+# the time it was away, just like opening the window does.
+#
+#   python server.py --port 8765 --saves profiles
+#
+# The protocol is one JSON object per line each way, over a local socket:
+#   {"session": "alice", "op": "state"}                  (first/count pick a run of generators)
+#   {"session": "alice", "op": "buy", "index": 1, "quantity": 10}
+#   {"session": "alice", "op": "prestige"}
+#   {"session": "alice", "op": "save"}
+#   {"session": "alice", "op": "close"}                  (save and page it out now)
+# Replies are {"ok": true, ...game state...} or {"ok": false, "error": "..."}.
+# "achievements" in a reply lists the ones unlocked since the previous reply.
+# Numbers past float range come back as strings ("1.234560e+400").
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+import traceback
+
+import numpy as np
+
+import bignum
+import engine
+from achievements import RATE, LTWIDGETS
+import saves
+from autobuy import payback_first
+from bank import GeneratorBank, columns
+from catalog import Catalog, CatalogError
+from engine import Engine, Generator, Total, BUY_MAX
+
+# What gets bought for a player while their game is paged out (None to just save up).
+offline_policy = payback_first
+
+# Seconds without a request before a game is saved and dropped from memory,
+# and how often to look for them.
+idle_after = 300
+sweep_interval = 10
+
+# The economy runs in steps of tick_step seconds, like the window's.
+tick_step = 1.0
+
+# games the shared bank has room for at first; it doubles when full
+initial_slots = 1024
+
+_session_name = re.compile(r'[A-Za-z0-9_-]{1,64}$')
+_ops = ('state', 'buy', 'prestige', 'save', 'close')
+
+
+class RequestError(ValueError):
+    """ A request the server won't carry out; the message goes back to the client. """
+
+
+class SlotTotal():
+    """ The engine.Total of a game in a SessionPool. The numbers live in the pool's
+        arrays, so the batched tick can update every game at once. If one outgrows
+        float range the game is given a real Total (see SessionPool.promote()). """
+
+    __slots__ = ('_pool', '_slot')
+
+    def __init__(self, pool, slot):
+        self._pool = pool
+        self._slot = slot
+        return None
+
+def _total_field(name):
+    def get(self):
+        own = self._pool.own_totals[self._slot]
+        if own is not None:
+            return getattr(own, name)
+        return float(self._pool.totals[name][self._slot])
+
+    def set(self, x):
+        own = self._pool.own_totals[self._slot]
+        if own is None:
+            if not isinstance(x, bignum.Big) and math.isfinite(x):
+                self._pool.totals[name][self._slot] = x
+                return None
+            own = self._pool.promote(self._slot)
+        setattr(own, name, x)
+        return None
+    return property(get, set)
+
+for _f in saves.total_fields:
+    setattr(SlotTotal, _f, _total_field(_f))
+
+
+class SessionPool():
+    """ The loaded games, sharing one GeneratorBank: game slot has rows
+        slot * width to (slot + 1) * width. Each game's Engine plays on a view of
+        its rows (GeneratorBank.rows()), so buying works as usual, while tick()
+        runs every game in one pass.
+
+        >>> pool = SessionPool(width = len(engine.items))
+
+        >>> slot = pool.add(Engine())
+
+        >>> pool.tick(1.0)
+    """
+
+    def __init__(self, width, slots = initial_slots):
+        self.width = width
+        self.bank = GeneratorBank([''] * (width * slots), cost_base = 0, rate_base = 0)
+        self.totals = {f: np.zeros(slots) for f in saves.total_fields}
+        self.own_totals = [None] * slots     # a Total, for the games past float range
+        self.big = np.zeros(slots, dtype = bool)
+        self.live = np.zeros(slots, dtype = bool)
+        # where each game's rate and lifetime widgets next reach an achievement
+        self.next_rate = np.full(slots, np.inf)
+        self.next_lifetime = np.full(slots, np.inf)
+        self.engines = [None] * slots
+        self.free = list(range(slots - 1, -1, -1))
+        return None
+
+    def __len__(self):
+        return len(self.engines) - len(self.free)
+
+    def add(self, game):
+        """ Move game into a free slot (growing the pool if there isn't one) and
+        rebind it to the pool's rows. Returns the slot. """
+        if len(game.bank) != self.width:
+            raise RequestError(f'game has {len(game.bank)} generators, this server plays {self.width}')
+        if not self.free:
+            self._grow()
+        slot = self.free.pop()
+        a, b = slot * self.width, (slot + 1) * self.width
+        for c in columns:
+            getattr(self.bank, c)[a:b] = getattr(game.bank, c)
+        values = {f: getattr(game.total, f) for f in saves.total_fields}
+        if all(bignum.isfinite(x) and not isinstance(x, bignum.Big) for x in values.values()):
+            for f, x in values.items():
+                self.totals[f][slot] = x
+        else:
+            self.own_totals[slot] = game.total
+            self.big[slot] = True
+        self.live[slot] = True
+        self.engines[slot] = game
+        self._bind(game, slot)
+        self.watch(slot)
+        return slot
+
+    def watch(self, slot):
+        """ Note where slot's game next reaches an achievement, so tick() only calls into
+        its Achievements when it gets there. Call after anything but tick() changes the game. """
+        cheevos = self.engines[slot].achievements
+        self.next_rate[slot] = cheevos.next_threshold(RATE)
+        self.next_lifetime[slot] = cheevos.next_threshold(LTWIDGETS)
+        return None
+
+    def remove(self, slot):
+        """ Empty slot (save its game first). """
+        a, b = slot * self.width, (slot + 1) * self.width
+        for c in columns:
+            getattr(self.bank, c)[a:b] = 0
+        for f in saves.total_fields:
+            self.totals[f][slot] = 0
+        self.own_totals[slot] = None
+        self.big[slot] = False
+        self.live[slot] = False
+        self.next_rate[slot] = np.inf
+        self.next_lifetime[slot] = np.inf
+        self.engines[slot] = None
+        self.free.append(slot)
+        return None
+
+    def promote(self, slot):
+        """ Give the game in slot a Total of its own, for numbers past float range. It's
+        ticked on its own from now on. """
+        own = Total()
+        for f in saves.total_fields:
+            setattr(own, f, float(self.totals[f][slot]))
+        self.own_totals[slot] = own
+        self.big[slot] = True
+        return own
+
+    def _bind(self, game, slot):
+        bank = self.bank.rows(slot * self.width, (slot + 1) * self.width, names = game.bank.names)
+        game.bank = bank
+        game.generators = [Generator.view(bank, i) for i in range(len(bank))]
+        game.total = SlotTotal(self, slot)
+        return None
+
+    def _grow(self):
+        old = len(self.engines)
+        slots = old * 2
+        bank = GeneratorBank([''] * (self.width * slots), cost_base = 0, rate_base = 0)
+        for c in columns:
+            getattr(bank, c)[:old * self.width] = getattr(self.bank, c)
+        self.bank = bank
+        for f in saves.total_fields:
+            self.totals[f] = np.concatenate((self.totals[f], np.zeros(slots - old)))
+        self.own_totals += [None] * (slots - old)
+        self.big = np.concatenate((self.big, np.zeros(slots - old, dtype = bool)))
+        self.live = np.concatenate((self.live, np.zeros(slots - old, dtype = bool)))
+        self.next_rate = np.concatenate((self.next_rate, np.full(slots - old, np.inf)))
+        self.next_lifetime = np.concatenate((self.next_lifetime, np.full(slots - old, np.inf)))
+        self.engines += [None] * (slots - old)
+        self.free = list(range(slots - 1, old - 1, -1)) + self.free
+        for slot in np.flatnonzero(self.live):
+            self._bind(self.engines[slot], int(slot))
+        return None
+
+    def tick(self, dt = 1.0):
+        """ Engine.tick(dt) for every game: one pass over the shared bank for those in float
+        range, and Engine.tick() itself for the few that aren't (or overflow now). Only the
+        games that reached an achievement threshold have their achievements looked at. """
+        rate = self.bank.rate.reshape(-1, self.width)
+        prestige = self.totals['prestige']
+        with np.errstate(over = 'ignore', invalid = 'ignore'):
+            tr = rate.sum(axis = 1) * prestige
+            made = tr * dt
+            widgets = self.totals['widgets'] + made
+            lifetime = self.totals['ltwidgets'] + made
+        fast = self.live & ~self.big & np.isfinite(widgets) & np.isfinite(lifetime)
+
+        with np.errstate(over = 'ignore', invalid = 'ignore'):
+            rows = np.where(fast[:, None], rate * (prestige * dt)[:, None], 0.0).ravel()
+            self.bank.widgets += rows
+            self.bank.lifetime_widgets += rows
+        np.copyto(self.totals['rate'], tr, where = fast)
+        np.copyto(self.totals['widgets'], widgets, where = fast)
+        np.copyto(self.totals['ltwidgets'], lifetime, where = fast)
+
+        reached = fast & ((tr >= self.next_rate) | (lifetime >= self.next_lifetime))
+        for slot in np.flatnonzero(reached):
+            cheevos = self.engines[slot].achievements
+            cheevos.update(RATE, float(tr[slot]))
+            cheevos.update(LTWIDGETS, float(lifetime[slot]))
+            self.watch(slot)
+        for slot in np.flatnonzero(self.live & ~fast):
+            self.engines[slot].tick(dt)
+            self.watch(slot)
+        return None
+
+
+def _integer(x):
+    """ An int in the request, not a bool (JSON true is an int to isinstance). """
+    return isinstance(x, int) and not isinstance(x, bool)
+
+
+def _number(x):
+    """ A game number for JSON: a float, or a string when it's past float range. """
+    if isinstance(x, bignum.Big) or not math.isfinite(x):
+        return format(x, '.6e')
+    return float(x)
+
+
+class GameServer():
+    """ The sessions, their save files and the tick loop; serve_client() speaks the
+        protocol at the top of this file.
+
+        >>> server = GameServer('profiles')
+
+        >>> asyncio.run(serve(server, '127.0.0.1', 8765))
+    """
+
+    def __init__(self, folder, catalog = None, policy = offline_policy, idle_after = idle_after, \
+                 step = tick_step, clock = time.monotonic):
+        self.folder = folder
+        self.catalog = catalog if catalog is not None else engine.stock_catalog
+        self.policy = policy
+        self.idle_after = idle_after
+        self.step = step
+        self.clock = clock
+        self.pool = SessionPool(len(self.catalog))
+        self.slots = {}         # session -> slot in the pool
+        self.seen = {}          # session -> clock() at its last request
+        self.loading = {}       # session -> task loading it
+        self.writes = {}        # session -> future of its page-out write
+        os.makedirs(folder, exist_ok = True)
+        return None
+
+    def path(self, session):
+        return os.path.join(self.folder, f'{session}.dat')
+
+    def _load(self, session):
+        """ The session's game from its save, with the time away credited, or a new game.
+        Runs on a worker thread. """
+        path = self.path(session)
+        try:
+            game = Engine.load(path, rng = random.Random(), policy = self.policy, catalog = self.catalog)
+        except saves.SaveError as e:
+            # keep the damaged file for inspection rather than saving over it
+            os.replace(path, f'{path}.damaged')
+            print(f'{session}: {e}; started a new game, the old file is {path}.damaged', file = sys.stderr)
+            game = None
+        if game is None:
+            game = Engine(rng = random.Random(), catalog = self.catalog)
+        # the pool ticks past Engine.tick(), so no production history is kept here
+        game.history = None
+        return game
+
+    async def _open(self, session):
+        pending = self.writes.get(session)
+        if pending is not None:
+            await pending
+        game = await asyncio.get_running_loop().run_in_executor(None, self._load, session)
+        slot = self.pool.add(game)
+        self.slots[session] = slot
+        return slot
+
+    async def session(self, session):
+        """ The Engine for session, loading it if it isn't already. """
+        slot = self.slots.get(session)
+        if slot is None:
+            task = self.loading.get(session)
+            if task is None:
+                task = self.loading[session] = asyncio.ensure_future(self._open(session))
+                task.add_done_callback(lambda t: self.loading.pop(session, None))
+            slot = await task
+        self.seen[session] = self.clock()
+        return self.pool.engines[slot]
+
+    def page_out(self, session):
+        """ Save session and drop it from the pool. Returns the future of the write. """
+        slot = self.slots.pop(session)
+        self.seen.pop(session, None)
+        snapshot = self.pool.engines[slot].snapshot()
+        self.pool.remove(slot)
+        write = asyncio.get_running_loop().run_in_executor(None, saves.write, self.path(session), snapshot)
+        self.writes[session] = write
+
+        def written(f):
+            if self.writes.get(session) is f:
+                del self.writes[session]
+            if not f.cancelled() and f.exception() is not None:
+                print(f'{session}: save failed: {f.exception()}', file = sys.stderr)
+        write.add_done_callback(written)
+        return write
+
+    def page_out_idle(self, now):
+        for session, seen in list(self.seen.items()):
+            if now - seen > self.idle_after:
+                self.page_out(session)
+        return None
+
+    async def run_ticks(self):
+        """ Tick every loaded game in whole steps against the clock, and page out idle ones. """
+        last = self.clock()
+        swept = last
+        behind = 0.0
+        while True:
+            await asyncio.sleep(self.step)
+            now = self.clock()
+            behind += now - last
+            last = now
+            steps = int(behind // self.step)
+            if steps:
+                # production is linear between purchases, so a late tick is credited in one go
+                behind -= steps * self.step
+                self.pool.tick(steps * self.step)
+            if now - swept >= sweep_interval:
+                swept = now
+                self.page_out_idle(now)
+
+    async def close(self):
+        """ Save every loaded game and wait for the writes. """
+        for session in list(self.slots):
+            self.page_out(session)
+        if self.writes:
+            await asyncio.gather(*self.writes.values(), return_exceptions = True)
+        return None
+
+    def state(self, game, first = 0, count = None):
+        t = game.total
+        rows = game.generators[first:None if count is None else first + count]
+        return {'widgets': _number(t.widgets),
+                'rate': _number(t.rate),
+                'prestige': _number(t.prestige),
+                'new_prestige': _number(game.new_prestige()),
+                'idle_widgets': _number(t.idle_widgets),
+                'idle_purchases': game.idle_purchases,
+                'first': first,
+                'generators': [{'name': g.name,
+                                'owned': g.owned,
+                                'growth': g.growth,
+                                'rate': _number(bignum.mul(g.rate, t.prestige)),
+                                'cost': _number(g.bulk_cost(1))} for g in rows],
+                }
+
+    async def handle(self, request):
+        """ The reply to one request (a dict). Raises RequestError for bad requests. """
+        if not isinstance(request, dict):
+            raise RequestError('a request is a JSON object')
+        session = request.get('session')
+        if not isinstance(session, str) or not _session_name.match(session):
+            raise RequestError('session must be 1 to 64 letters, digits, _ or -')
+        op = request.get('op', 'state')
+        if op not in _ops:
+            raise RequestError(f'unknown op {op!r}, expected one of {", ".join(_ops)}')
+
+        if op == 'close':
+            if session in self.slots:
+                await self.page_out(session)
+            return {'ok': True}
+
+        game = await self.session(session)
+        reply = {'ok': True}
+        if op == 'buy':
+            index = request.get('index')
+            quantity = request.get('quantity', 1)
+            if not _integer(index) or not 0 <= index < len(game.generators):
+                raise RequestError(f'index must be 0 to {len(game.generators) - 1}')
+            if not _integer(quantity) or not 1 <= quantity <= BUY_MAX:
+                raise RequestError(f'quantity must be 1 to {BUY_MAX} ({BUY_MAX} buys as many as you can)')
+            reply['bought'] = game.buy(index, quantity)
+        elif op == 'prestige':
+            reply['bonus'] = _number(game.prestige())
+        elif op == 'save':
+            await asyncio.get_running_loop().run_in_executor(None, saves.write, self.path(session), game.snapshot())
+        if session in self.slots:
+            self.pool.watch(self.slots[session])
+        reply['achievements'] = [{'key': a.key, 'title': a.title} for a in game.achievements.drain()]
+        first = request.get('first', 0)
+        count = request.get('count')
+        if not _integer(first) or first < 0 or not (count is None or _integer(count) and count >= 0):
+            raise RequestError('first and count must be whole numbers')
+        reply.update(self.state(game, first, count))
+        return reply
+
+    async def serve_client(self, reader, writer):
+        """ asyncio.start_server() callback: answer requests until the client hangs up. """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    reply = await self.handle(json.loads(line))
+                except (RequestError, json.JSONDecodeError, UnicodeDecodeError) as e:
+                    reply = {'ok': False, 'error': str(e)}
+                except Exception as e:
+                    # a bug, not a bad request: keep the connection (and the server) going
+                    traceback.print_exc()
+                    reply = {'ok': False, 'error': f'internal error ({type(e).__name__})'}
+                writer.write(json.dumps(reply).encode('utf-8') + b'\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass                # the client went away, or the server is shutting down
+        finally:
+            writer.close()
+        return None
+
+
+async def serve(server, host = '127.0.0.1', port = 8765):
+    """ Run server until cancelled, then save every game. """
+    listener = await asyncio.start_server(server.serve_client, host, port)
+    ticks = asyncio.ensure_future(server.run_ticks())
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        ticks.cancel()
+        await server.close()
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Host many pyClicker games behind a local JSON socket.')
+    parser.add_argument('--host', default = '127.0.0.1')
+    parser.add_argument('--port', type = int, default = 8765)
+    parser.add_argument('--saves', default = 'profiles', help = 'folder for the players\' save files')
+    parser.add_argument('--catalog', metavar = 'FILE', help = 'play with the items in FILE (see catalog.py)')
+    parser.add_argument('--idle', type = float, default = idle_after,
+                        help = 'seconds without a request before a game is saved and paged out')
+    args = parser.parse_args(argv)
+    try:
+        catalog = Catalog.load(args.catalog) if args.catalog else None
+    except (OSError, CatalogError) as e:
+        parser.error(str(e))
+
+    server = GameServer(args.saves, catalog = catalog, idle_after = args.idle)
+    try:
+        asyncio.run(serve(server, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
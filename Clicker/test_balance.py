@@ -0,0 +1,16 @@
+# pyClicker IDLE game - tests for the balancing harness (balance.py)
+import balance
+
+def test_games_spread():
+    """ Seeded games must differ by more than their growth roll, or every percentile
+    is the same number and the report says nothing about the balance. """
+    (params, summary), = balance.sweep({}, 12, 12, 'best_value', 2.0, jobs = 1)
+    s = summary['time_to_prestige']
+    assert s['reached'] > 0.5 and s['p10'] < s['p90']
+    s = summary['first_purchase']['Square']
+    assert s['p10'] < s['p90']
+    assert any(s['p10'] < s['p90'] for s in summary['widgets_per_hour'].values() if s['n'] > 2)
+
+def test_same_seed_same_game():
+    params = dict(balance.defaults)
+    assert balance.play(params, 7, 2, 'cheapest', 2.0) == balance.play(params, 7, 2, 'cheapest', 2.0)
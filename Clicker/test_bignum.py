@@ -0,0 +1,22 @@
+# pyClicker IDLE game - tests for numbers past float range (bignum.py)
+import math
+
+import numpy as np
+import pytest
+
+from bignum import Big, big
+
+
+def test_compares_with_floats_ints_and_numpy():
+    x = Big(3.0, 400)
+    assert x > 1e300 and x > np.float64(2) and not x < np.int64(5)
+    assert 2 < x < math.inf
+    assert x == Big(3.0, 400) and x != big(3e300)
+
+def test_not_equal_to_non_numbers():
+    # `!=` against a value not set yet (None) is how caches notice a change
+    x = Big(3.0, 400)
+    assert x != None and not x == None and None != x
+    assert x != 'x'
+    with pytest.raises(TypeError):
+        x < None
@@ -0,0 +1,49 @@
+# pyClicker IDLE game - tests for offline progress (fastforward.py)
+# fast_forward() jumps from purchase to purchase; step_forward() ticks every
+# second. With the same step they have to end up with the same game.
+import random
+
+import pytest
+
+import autobuy
+import fastforward
+from engine import Engine
+
+policies = {'cheapest': fastforward.cheapest,
+            'best_value': fastforward.best_value,
+            'payback_first': autobuy.payback_first,
+            }
+
+def start(seed):
+    """ A seeded new game, clicked up to its first Pencil. """
+    game = Engine(rng = random.Random(seed))
+    while game.total.widgets < game.cost(1):
+        game.buy(0)
+    return game
+
+@pytest.mark.parametrize('name', sorted(policies))
+@pytest.mark.parametrize('seed', [0, 1])
+def test_matches_step_forward(name, seed):
+    fast, slow = start(seed), start(seed)
+    fastforward.fast_forward(fast, 3 * 3600, policies[name])
+    fastforward.step_forward(slow, 3 * 3600, policies[name])
+    assert fast.bank.owned.tolist() == slow.bank.owned.tolist()
+    # payback_first buys runs of one item in one go, which rounds the sums differently
+    assert float(fast.total.widgets) == pytest.approx(float(slow.total.widgets), rel = 1e-9, abs = 1e-6)
+    assert float(fast.total.ltwidgets) == pytest.approx(float(slow.total.ltwidgets), rel = 1e-9)
+
+def test_no_policy_just_produces():
+    fast, slow = start(0), start(0)
+    fast.buy(1)
+    slow.buy(1)
+    assert fastforward.fast_forward(fast, 600.5)[1] == 0
+    fastforward.step_forward(slow, 600.5)
+    assert float(fast.total.widgets) == pytest.approx(float(slow.total.widgets))
+
+def test_credit_idle_counts_purchases():
+    game = start(0)
+    made = game.credit_idle(3600, autobuy.payback_first)
+    assert made > 0 and game.idle_purchases > 0
+    assert game.idle_purchases <= sum(game.bank.owned.tolist()) - game.bank.owned[0]
+    game.credit_idle(60)
+    assert game.idle_purchases == 0
@@ -0,0 +1,30 @@
+# pyClicker IDLE game - tests for the production history (history.py)
+import bignum
+from engine import Engine, BUY_MAX
+from history import History
+
+
+def late_game():
+    """ A game whose total rate is past float range (a bignum.Big), with a history. """
+    game = Engine()
+    game.total.prestige = 1e200
+    game.total.widgets = bignum.from_log10(400.0)
+    last = len(game.bank)
+    assert game.buy(last - 2, BUY_MAX) and game.buy(last - 1, BUY_MAX)
+    game.history = History(len(game.bank))
+    game.tick(1)
+    assert isinstance(game.total.rate, bignum.Big)
+    return game
+
+def test_big_rate_save_loads_with_history(tmp_path):
+    path = str(tmp_path / 'late.dat')
+    late_game().save(path)
+    game = Engine.load(path)        # credits the time since, through the restored history
+    assert game.history is not None and game.history.now >= 1
+    assert isinstance(game.total.rate, bignum.Big)
+
+def test_first_record_after_unpack_is_big():
+    game = late_game()
+    history = History.unpack(game.history.pack(), len(game.bank))
+    history.record(1.0, game.total.rate, game.bank.rate)
+    assert history.now == game.history.now + 1
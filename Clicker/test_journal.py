@@ -0,0 +1,62 @@
+# pyClicker IDLE game - tests for the event journal (journal.py)
+# A seeded session is recorded through the engine's own tick, buy and
+# prestige, then replayed on a fresh Engine.
+import pytest
+
+import journal
+from engine import Engine, BUY_MAX
+
+def record(path):
+    """ Play a short session with a journal on: clicks, purchases, long and short
+    ticks, a prestige and a few checkpoints. Returns the game as it ended. """
+    game = Engine()
+    log = journal.Journal(path, seed = 7)
+    log.start(game)
+    for _ in range(20):
+        game.buy(0)
+    game.buy(1)
+    for hour in range(3):
+        for _ in range(600):
+            game.tick(1.0)
+        game.tick(0.25)
+        for i in range(1, 6):
+            game.buy(i, BUY_MAX)
+        log.checkpoint(game)
+    game.prestige()
+    game.buy(0)
+    game.tick(1.0)
+    log.checkpoint(game)
+    log.close(game)
+    return game
+
+def test_replay_matches(tmp_path):
+    path = str(tmp_path / 's.journal')
+    game = record(path)
+    result = journal.replay(path)
+    assert result.ok, result.mismatches
+    assert result.ended and result.prestiges == 1 and result.checkpoints == 4
+    assert result.buys > 20 and result.ticks == 3 * 601 + 1
+    assert journal.digest(result.game) == journal.digest(game)
+
+def test_truncated_journal_replays(tmp_path):
+    path = str(tmp_path / 's.journal')
+    record(path)
+    with open(path, 'rb') as f:
+        data = f.read()
+    whole = journal.replay(path)
+    # cut anywhere after the starting state, mid-record included
+    seed, length = journal._start.unpack_from(data, journal._header.size + 1)
+    begin = journal._header.size + 1 + journal._start.size + length
+    for cut in (begin + 1, begin + 6, (begin + len(data)) // 2, len(data) - 3):
+        short = str(tmp_path / f'cut{cut}.journal')
+        with open(short, 'wb') as f:
+            f.write(data[:cut])
+        result = journal.replay(short)
+        assert not result.ended and not result.mismatches
+        assert result.game is not None and result.events < whole.events
+
+def test_not_a_journal(tmp_path):
+    path = tmp_path / 'junk.journal'
+    path.write_bytes(b'not a journal')
+    with pytest.raises(journal.JournalError):
+        journal.replay(str(path))
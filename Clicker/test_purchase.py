@@ -0,0 +1,109 @@
+# pyClicker IDLE game - tests for the max-buyable math (purchase.py)
+# Random banks with each row's price boundary put right on the amount, give
+# or take an ulp or two, where logarithms go wrong. Seeded, so a failure can
+# be repeated.
+import math
+import random
+from fractions import Fraction
+
+import pytest
+
+import bignum
+from bank import GeneratorBank
+
+rows = 20
+growth_choices = (1.07, 1.075, 1.08, 1.085, 1.09)
+
+
+def exact_cost(b, r, k, n):
+    """ What n more cost with b, r, k taken exactly as the floats they are. """
+    B, R = Fraction(b), Fraction(r)
+    return B * R ** k * (R ** n - 1) / (R - 1)
+
+def exact_max(b, r, k, amount, near = 0):
+    """ The most amount buys, in rational arithmetic, looked for from near (the answer
+    being checked, so it's usually a step or two). """
+    A = Fraction(amount)
+    n = max(near, 0)
+    while n > 0 and exact_cost(b, r, k, n) > A:
+        n -= 1
+    while exact_cost(b, r, k, n + 1) <= A:
+        n += 1
+    return n
+
+def boundary_bank(rng, amount):
+    """ A bank where target[i] more of row i cost the amount, nudged by up to two ulps. """
+    growth = [rng.choice(growth_choices + (rng.uniform(1.001, 1.5),)) for _ in range(rows)]
+    owned = [rng.randrange(0, 300) for _ in range(rows)]
+    cost_base = []
+    for r, k in zip(growth, owned):
+        n = rng.randrange(0, 200)
+        b = amount * (r - 1) / (r ** k * (r ** n - 1)) if n else rng.uniform(1, amount)
+        for _ in range(rng.randrange(-2, 3)):
+            b = math.nextafter(b, math.inf)
+        cost_base.append(b if math.isfinite(b) and b > 0 else 1.0)
+    return GeneratorBank([f'g{i}' for i in range(rows)], cost_base = cost_base, growth = growth,
+                         rate_base = 1.0, owned = owned)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_max_is_most_affordable_at_the_charged_price(seed):
+    rng = random.Random(seed)
+    for _ in range(20):
+        amount = 10.0 ** rng.uniform(0, 12)
+        bank = boundary_bank(rng, amount)
+        batched = bank.max_buyable(amount)
+        for i in range(rows):
+            m = int(batched[i])
+            assert bank.max_buyable_one(i, amount) == m
+            assert bank.price(i, m) <= amount < bank.price(i, m + 1)
+
+@pytest.mark.parametrize('seed', range(10))
+def test_max_matches_exact_arithmetic(seed):
+    # Right on a boundary the exact answer and the one buy() can be charged for may differ.
+    # price() is a few float operations, and rounds by an ulp or so: when the exact cost of
+    # n is within that of the amount, price(n) can land on the other side of it. The
+    # boundaries here are put within two ulps of the amount on purpose, so that happens to
+    # a good fraction of rows. Those must be one off, and only that close to the amount.
+    rng = random.Random(seed)
+    for _ in range(10):
+        amount = 10.0 ** rng.uniform(0, 12)
+        bank = boundary_bank(rng, amount)
+        batched = bank.max_buyable(amount)
+        for i in range(rows):
+            b, r, k = float(bank.cost_base[i]), float(bank.growth[i]), int(bank.owned[i])
+            m = int(batched[i])
+            exact = exact_max(b, r, k, amount, m)
+            if m != exact:
+                assert abs(m - exact) == 1
+                n = max(m, exact)
+                assert (bank.price(i, n) <= amount) != (exact_cost(b, r, k, n) <= Fraction(amount))
+                assert abs(exact_cost(b, r, k, n) / Fraction(amount) - 1) < 1e-14
+
+@pytest.mark.parametrize('seed', range(10))
+def test_max_is_exact_away_from_boundaries(seed):
+    # with the amount anywhere else, there's no rounding to fall foul of
+    rng = random.Random(seed)
+    for _ in range(10):
+        amount = 10.0 ** rng.uniform(0, 12)
+        bank = boundary_bank(rng, amount)
+        other = amount * rng.uniform(0.5, 2)
+        batched = bank.max_buyable(other)
+        for i in range(rows):
+            b, r, k = float(bank.cost_base[i]), float(bank.growth[i]), int(bank.owned[i])
+            assert int(batched[i]) == exact_max(b, r, k, other, int(batched[i]))
+
+def test_max_past_float_range():
+    rng = random.Random(0)
+    bank = boundary_bank(rng, 1e6)
+    for amount in (bignum.from_log10(400.0), bignum.from_log10(5000.0)):
+        batched = bank.max_buyable(amount)
+        for i in range(rows):
+            m = int(batched[i])
+            assert m > 0
+            assert bank.max_buyable_one(i, amount) == m
+            assert bank.price(i, m) <= amount < bank.price(i, m + 1)
+
+def test_nothing_to_spend():
+    bank = boundary_bank(random.Random(0), 1e6)
+    assert not bank.max_buyable(0).any()
@@ -0,0 +1,131 @@
+# pyClicker IDLE game - tests for the save format (saves.py) and loading old saves
+import pickle
+import random
+import sys
+import time
+
+import pytest
+
+import bignum
+import journal
+import saves
+from engine import Engine, BUY_MAX
+
+def played(seed = 0):
+    """ A seeded game with purchases, a prestige, achievements and a Big total. """
+    game = Engine(rng = random.Random(seed))
+    game.total.widgets = 1e9
+    game.total.ltwidgets = 1e15
+    for i in range(1, 6):
+        game.buy(i, BUY_MAX)
+    game.tick(60)
+    game.prestige()
+    game.total.spent = bignum.from_log10(500.0)
+    game.check_achievements()
+    return game
+
+def test_round_trip(tmp_path):
+    game = played()
+    path = str(tmp_path / 'clickersave.dat')
+    saves.write(path, game.snapshot())
+    snapshot = saves.read(path)
+    assert journal.compare(game.snapshot(), snapshot) == []
+    assert isinstance(snapshot['total']['spent'], bignum.Big)
+    back = Engine.from_snapshot(snapshot)
+    assert journal.compare(game.snapshot(), back.snapshot()) == []
+    assert back.achievements.unlocked == game.achievements.unlocked
+    assert back.bank.every.tolist() == game.bank.every.tolist()
+
+def test_load_credits_time_away(tmp_path):
+    game = played()
+    path = str(tmp_path / 'clickersave.dat')
+    game.save(path)
+    back = Engine.load(path)
+    assert back.bank.owned.tolist() == game.bank.owned.tolist()
+    assert back.total.prestige == game.total.prestige
+    assert back.total.ltwidgets >= game.total.ltwidgets
+
+def test_damaged_save(tmp_path):
+    path = tmp_path / 'clickersave.dat'
+    saves.write(str(path), played().snapshot())
+    data = bytearray(path.read_bytes())
+    data[len(data) // 2] ^= 0xff
+    path.write_bytes(bytes(data))
+    with pytest.raises(saves.SaveError):
+        saves.read(str(path))
+
+
+class Generator():
+    """ What clicker.py pickled before the engine was split out: a plain object. """
+
+class Total():
+    pass
+
+def test_legacy_pickle_migrates(tmp_path, monkeypatch):
+    # pickled from the script, so the classes were __main__.Generator and __main__.Total
+    monkeypatch.setattr(Generator, '__module__', '__main__')
+    monkeypatch.setattr(Total, '__module__', '__main__')
+    monkeypatch.setattr(sys.modules['__main__'], 'Generator', Generator, raising = False)
+    monkeypatch.setattr(sys.modules['__main__'], 'Total', Total, raising = False)
+    game = played()
+    generators = []
+    for g in game.generators:
+        old = Generator()
+        old.__dict__.update(name = g.name, cost_base = g.cost_base, rate_base = g.rate_base,
+                            growth = g.growth, owned = g.owned, widgets = g.widgets,
+                            lifetime_widgets = g.lifetime_widgets)
+        generators.append(old)
+    total = Total()
+    total.__dict__.update(widgets = 1234.5, rate = 10.0, idle_widgets = 0, prestige = 2.0,
+                          spent = 50.0, ltwidgets = 1e9)
+    path = str(tmp_path / 'clickersave.pkl')
+    saved = time.time() - 10
+    with open(path, 'wb') as f:
+        pickle.dump(generators, f, protocol = 2)
+        pickle.dump(total, f, protocol = 2)
+        pickle.dump(saved, f, protocol = 2)
+
+    back = Engine.load(path)
+    assert back.bank.names == game.bank.names
+    assert back.bank.owned.tolist() == game.bank.owned.tolist()
+    assert back.bank.growth.tolist() == game.bank.growth.tolist()
+    assert back.total.prestige == 2.0 and back.total.spent == 50.0
+    assert back.total.ltwidgets >= 1e9
+
+    # and the next save is in the new format
+    new = str(tmp_path / 'clickersave.dat')
+    back.save(new)
+    assert journal.compare(back.snapshot(), saves.read(new)) == []
+
+def test_pickle_with_other_classes_is_refused(tmp_path):
+    path = tmp_path / 'clickersave.pkl'
+    path.write_bytes(pickle.dumps(random.Random(0)))
+    with pytest.raises(saves.SaveError):
+        Engine.load(str(path))
+
+
+def test_autosaver_writes_newest(tmp_path):
+    path = str(tmp_path / 'clickersave.dat')
+    saver = saves.Autosaver(path)
+    game = played()
+    saver.submit(Engine().snapshot())
+    saver.submit(game.snapshot())
+    saver.stop()
+    assert saver.error is None
+    assert journal.compare(game.snapshot(), saves.read(path)) == []
+
+def test_autosaver_survives_a_bad_snapshot(tmp_path):
+    path = str(tmp_path / 'clickersave.dat')
+    saver = saves.Autosaver(path)
+    saver.submit({'not': 'a snapshot'})
+    for _ in range(500):
+        if saver.error is not None:
+            break
+        time.sleep(0.01)
+    assert isinstance(saver.error, KeyError)
+    game = played()
+    saver.submit(game.snapshot())       # still written: the thread carried on
+    saver.stop()
+    assert saver.error is None
+    assert journal.compare(game.snapshot(), saves.read(path)) == []
+    saver.stop()                        # the thread is gone; returns straight away
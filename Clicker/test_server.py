@@ -0,0 +1,92 @@
+# pyClicker IDLE game - tests for the game server (server.py)
+import asyncio
+import json
+import random
+
+import bignum
+import engine
+import journal
+import server
+from engine import Engine, BUY_MAX
+
+def games(n):
+    """ Seeded games at different stages: just started, a few rows bought, and one with
+    a prestige bonus. """
+    made = []
+    for s in range(n):
+        game = Engine(rng = random.Random(s))
+        game.total.widgets = 10.0 ** (2 + s)
+        game.total.ltwidgets = game.total.widgets
+        for i in range(1, 1 + s % 6):
+            game.buy(i, BUY_MAX)
+        if s % 3 == 2:
+            game.total.prestige = 1.5 + s
+        made.append(game)
+    return made
+
+def test_pool_tick_matches_engine_tick():
+    pool = server.SessionPool(len(engine.items), slots = 2)      # and make it grow
+    played = games(7)
+    alone = [Engine.from_snapshot(g.snapshot(), rng = random.Random(0)) for g in played]
+    for game in alone:
+        game.history = None
+    for game in played:
+        pool.add(game)
+    for dt in [1.0] * 50 + [0.25, 3.5, 1.0, 600.0, 1.0]:
+        pool.tick(dt)
+        for game in alone:
+            game.tick(dt)
+    for game, reference in zip(played, alone):
+        assert journal.compare(reference.snapshot(), game.snapshot()) == []
+        assert set(game.achievements.unlocked) == set(reference.achievements.unlocked)
+
+def test_big_game_in_pool_matches():
+    pool = server.SessionPool(len(engine.items))
+    game = Engine(rng = random.Random(1))
+    game.total.prestige = 1e200
+    game.total.widgets = bignum.from_log10(400.0)
+    game.buy(len(game.bank) - 1, BUY_MAX)
+    reference = Engine.from_snapshot(game.snapshot(), rng = random.Random(0))
+    reference.history = None
+    pool.add(game)
+    for _ in range(5):
+        pool.tick(1.0)
+        reference.tick(1.0)
+    assert journal.compare(reference.snapshot(), game.snapshot()) == []
+
+class _Reader():
+    def __init__(self, lines):
+        self.lines = list(lines)
+
+    async def readline(self):
+        return self.lines.pop(0) if self.lines else b''
+
+class _Writer():
+    def __init__(self):
+        self.data = b''
+        self.closed = False
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        return None
+
+    def close(self):
+        self.closed = True
+
+def test_a_failing_request_gets_an_error_reply(tmp_path, capsys):
+    game_server = server.GameServer(str(tmp_path))
+
+    async def broken(request):
+        if request.get('op') == 'boom':
+            raise KeyError('boom')
+        return {'ok': True}
+    game_server.handle = broken
+    writer = _Writer()
+    asyncio.run(game_server.serve_client(_Reader([b'{"op": "boom"}\n', b'{"op": "state"}\n']), writer))
+    replies = [json.loads(line) for line in writer.data.splitlines()]
+    assert replies[0]['ok'] is False and 'KeyError' in replies[0]['error']
+    assert replies[1] == {'ok': True}       # the connection carried on
+    assert writer.closed
+    assert 'KeyError' in capsys.readouterr().err